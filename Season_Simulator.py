@@ -0,0 +1,171 @@
+# Season_Simulator.py (Monte Carlo qualification probabilities for the remaining fixtures)
+
+import os
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+DEFAULT_GOAL_RATE = 1.35     # mean goals per side when no group match has been played yet
+MAX_CELLS_PER_BATCH = 2_000_000   # runs x pending fixtures simulated per vectorized batch
+POOL_THRESHOLD = 20_000_000  # runs x pending fixtures above which the runs are spread over a process pool
+GOAL_TABLE_SIZE = 4096       # resolution of the goal lookup table (uniform int draw -> Poisson-distributed goals)
+
+# Quantized inverse CDF of Poisson(rate): indexing it with uniform integers is several times
+# cheaper than rng.poisson and keeps the goal matrices in int8.
+def goal_table(rate):
+    pmf = [math.exp(-rate) * rate ** k / math.factorial(k) for k in range(16)]
+    return np.repeat(np.arange(16, dtype=np.int8), np.maximum(np.round(np.array(pmf) * GOAL_TABLE_SIZE), 0).astype(np.int64))
+
+
+# --- SIMULATION KERNEL (top level so the process pool can pickle it) ---
+def simulate_chunk(model, runs, seed):
+    rng = np.random.default_rng(seed)
+    num_teams = len(model['team_ids'])
+    max_group = max((len(m) for m in model['group_members']), default=0)
+    position_counts = np.zeros((num_teams, max_group), dtype=np.int64)
+    stage_counts = {stage: np.zeros(num_teams, dtype=np.int64) for stage in model['stages']}
+    champion_counts = np.zeros(num_teams, dtype=np.int64)
+    batch_size = max(1, min(runs, MAX_CELLS_PER_BATCH // max(len(model['home']), 1)))
+    for start in range(0, runs, batch_size):
+        n = min(batch_size, runs - start)
+        tables = _simulate_groups(model, n, rng)
+        for order in tables:
+            np.add.at(position_counts, (order, np.broadcast_to(np.arange(order.shape[1]), order.shape)), 1)
+        winners = []
+        for fixture in model['knockout']:
+            team1, team2 = (_resolve_side(spec, tables, winners, n) for spec in fixture['sides'])
+            for team in (team1, team2): stage_counts[fixture['stage']] += np.bincount(team[team >= 0], minlength=num_teams)
+            if fixture['winner'] is not None:
+                winner = np.full(n, fixture['winner'])
+            else:
+                winner = np.where(rng.random(n) < 0.5, team1, team2)
+                winner = np.where(team1 < 0, team2, np.where(team2 < 0, team1, winner))
+            winners.append(winner)
+        if model['final'] is not None:
+            champion = winners[model['final']]
+            champion_counts += np.bincount(champion[champion >= 0], minlength=num_teams)
+    return position_counts, stage_counts, champion_counts
+
+# Plays the pending group fixtures n times and returns, per group, an (n, group size) array of
+# team indices in finishing order. A group with nothing left to play keeps the standings engine's
+# order; simulated ties are broken on goal difference, goals for and -goals against (the engine's
+# head-to-head step is not simulated). Per-team totals are summed with one reduceat over the fixture
+# sides pre-sorted by team.
+def _simulate_groups(model, n, rng):
+    points = np.tile(model['points'], (n, 1))
+    goals_for = np.tile(model['goals_for'], (n, 1))
+    goals_against = np.tile(model['goals_against'], (n, 1))
+    num_pending, table = len(model['home']), model['goal_table']
+    if num_pending:
+        home_goals = table[rng.integers(0, len(table), (n, num_pending), dtype=np.int16)]
+        away_goals = table[rng.integers(0, len(table), (n, num_pending), dtype=np.int16)]
+        order, bounds, teams = model['side_order'], model['side_bounds'], model['side_teams']
+        scored = np.concatenate([home_goals, away_goals], axis=1)[:, order]
+        conceded = np.concatenate([away_goals, home_goals], axis=1)[:, order]
+        earned = (scored > conceded).astype(np.int8) * 3 + (scored == conceded)
+        points[:, teams] += np.add.reduceat(earned, bounds, axis=1, dtype=np.int64)
+        goals_for[:, teams] += np.add.reduceat(scored, bounds, axis=1, dtype=np.int64)
+        goals_against[:, teams] += np.add.reduceat(conceded, bounds, axis=1, dtype=np.int64)
+    tables = []
+    for members, fixed in zip(model['group_members'], model['fixed_orders']):
+        if fixed is not None:
+            tables.append(np.broadcast_to(fixed, (n, len(fixed))))
+            continue
+        p, f, a = points[:, members], goals_for[:, members], goals_against[:, members]
+        order = np.lexsort((a, -f, -(f - a), -p), axis=-1)
+        tables.append(members[order])
+    return tables
+
+def _resolve_side(spec, tables, winners, n):
+    kind, a, b = spec
+    if kind == 'rank' and a is not None and b <= tables[a].shape[1]: return tables[a][:, b - 1]
+    if kind == 'winner' and a < len(winners): return winners[a]
+    if kind == 'team': return np.full(n, a)
+    return np.full(n, -1)
+
+
+# --- SEASON SIMULATOR ---
+class SeasonSimulator:
+    def __init__(self, tournament_app):
+        self.app = tournament_app
+        self.db = tournament_app.db
+
+    # Snapshot of everything the kernel needs, as plain numpy arrays and tuples.
+    def build_model(self, tournament_id):
+        teams = self.db.get_all_teams(tournament_id)
+        index = {team.team_id: i for i, team in enumerate(teams)}
+        group_names = sorted({team.group_name for team in teams})
+        group_members = [np.array([i for i, team in enumerate(teams) if team.group_name == g], dtype=np.int64) for g in group_names]
+        pending = self.db.get_pending_initial_fixtures(tournament_id)
+        played_sides = sum(team.matches_played for team in teams)
+        goal_rate = sum(team.goals_for for team in teams) / played_sides if played_sides else DEFAULT_GOAL_RATE
+
+        if not self.db.is_bracket_built(tournament_id): self.app.build_bracket_graph(tournament_id)
+        slots = {(s['match_no'], s['side']): s for s in self.db.get_bracket_slots(tournament_id)}
+        knockout_rows = [f for f in self.db.get_all_fixtures(tournament_id, team_map={}) if not f.is_initial_stage]
+        knockout_index = {f.match_no: i for i, f in enumerate(knockout_rows)}
+        rows = self.db.get_fixture_rows(f.match_no for f in knockout_rows)
+        knockout, stages, fed = [], [], set()
+        for fixture in knockout_rows:
+            row = rows[fixture.match_no]
+            if fixture.stage not in stages: stages.append(fixture.stage)
+            sides = []
+            for side in (1, 2):
+                slot, team_id = slots.get((fixture.match_no, side)), row[f'team{side}_id']
+                if row['status'] == 'Played' or slot is None:
+                    sides.append(('team', index.get(team_id, -1), None))
+                elif slot['source_match_no'] is not None:
+                    fed.add(slot['source_match_no'])
+                    sides.append(('winner', knockout_index.get(slot['source_match_no'], len(knockout_rows)), None))
+                else:
+                    group = slot['source_group'] if slot['source_group'] is not None else (group_names[0] if group_names else None)
+                    sides.append(('rank', group_names.index(group) if group in group_names else None, slot['source_rank']))
+            winner_id = self.app._winner_id(row)
+            knockout.append({'stage': fixture.stage, 'sides': sides, 'winner': index.get(winner_id) if winner_id is not None else None})
+        terminal = [i for i, f in enumerate(knockout_rows) if f.match_no not in fed]
+        home = np.array([index[f['team1_id']] for f in pending], dtype=np.int64)
+        away = np.array([index[f['team2_id']] for f in pending], dtype=np.int64)
+        standings = self.db.standings.tables(tournament_id)
+        open_groups = {teams[i].group_name for i in np.concatenate([home, away])}
+        fixed_orders = [None if g in open_groups else np.array([index[r['team_id']] for r in standings.get(g, [])], dtype=np.int64) for g in group_names]
+        side_team = np.concatenate([home, away])
+        side_order = np.argsort(side_team, kind='stable')
+        side_bounds = np.flatnonzero(np.r_[True, np.diff(side_team[side_order]) != 0]) if len(side_team) else side_team
+        return {
+            'team_ids': [team.team_id for team in teams], 'names': [team.name for team in teams],
+            'groups': [team.group_name for team in teams], 'group_members': group_members, 'fixed_orders': fixed_orders,
+            'points': np.array([team.points for team in teams], dtype=np.int64),
+            'goals_for': np.array([team.goals_for for team in teams], dtype=np.int64),
+            'goals_against': np.array([team.goals_against for team in teams], dtype=np.int64),
+            'home': home, 'away': away, 'side_order': side_order, 'side_bounds': side_bounds,
+            'side_teams': side_team[side_order][side_bounds], 'goal_rate': goal_rate, 'goal_table': goal_table(goal_rate),
+            'knockout': knockout, 'stages': stages,
+            'final': terminal[0] if len(terminal) == 1 else None,
+        }
+
+    # Returns each team's probability of every finishing position in its group and of reaching
+    # each knockout stage (plus 'Champion'). Large simulations are split across a process pool.
+    def run(self, tournament_id, runs=10000, seed=None, workers=None):
+        model = self.build_model(tournament_id)
+        if workers is None:
+            workers = min(os.cpu_count() or 1, 8) if runs * max(len(model['home']), 1) > POOL_THRESHOLD else 1
+        chunks = [runs // workers + (1 if i < runs % workers else 0) for i in range(workers)]
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                results = list(pool.map(simulate_chunk, [model] * workers, chunks, seeds))
+        else:
+            results = [simulate_chunk(model, runs, seeds[0])]
+        positions = sum(r[0] for r in results)
+        stage_counts = {stage: sum(r[1][stage] for r in results) for stage in model['stages']}
+        champions = sum(r[2] for r in results)
+        group_size = {int(i): len(members) for members in model['group_members'] for i in members}
+        teams = []
+        for i, name in enumerate(model['names']):
+            stages = {stage: round(float(stage_counts[stage][i]) / runs, 4) for stage in model['stages']}
+            if model['final'] is not None: stages['Champion'] = round(float(champions[i]) / runs, 4)
+            teams.append({'name': name, 'group': model['groups'][i],
+                          'positions': [round(float(c) / runs, 4) for c in positions[i][:group_size[i]]], 'stages': stages})
+        teams.sort(key=lambda t: (t['group'], sum(p * (k + 1) for k, p in enumerate(t['positions']))))
+        return {'runs': runs, 'goal_rate': round(model['goal_rate'], 3), 'teams': teams}
@@ -2,22 +2,24 @@
 
 import sqlite3
 import os
+import pathlib
+import queue
+import threading
+import time
 import datetime
 import random
 import json
-from tabulate import tabulate
-from colorama import Fore, Style, init
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER
-from reportlab.lib.units import inch
+import logging
+import re
+import csv
+import tempfile
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
 
 
 
 # --- INITIALIZATION ---
-init(autoreset=True)
 DB_NAME = "tournament_database.db"
 
 # <<< ORDINAL TITLE OF PLACE HOLDERS: >>>
@@ -28,145 +30,1041 @@ def to_ordinal(n):
         suffix = {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')
     return f"{n}{suffix} Place"
 
+# --- SCHEDULING ---
+# Group labels run like spreadsheet columns: A..Z, then AA, AB, ...
+def group_label(index):
+    label, index = "", index + 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        label = chr(65 + rem) + label
+    return label
 
-# --- DATABASE MANAGER CLASS (No changes here) ---
+def group_labels(count):
+    return [group_label(i) for i in range(count)]
+
+# knockout_mode k is a bracket of 2**k qualifiers ('0': no knockout stage).
+def knockout_size(knockout_mode):
+    k = int(knockout_mode or 0)
+    return 2 ** k if k > 0 else 0
+
+# Knockout rounds are named after the teams left in them.
+def knockout_stage_name(teams):
+    return {2: "Final", 4: "Semi-Final", 8: "Quarter-Final"}.get(teams, f"Round of {teams}")
+
+# One round of the circle method, as (position, position) index pairs: position 0 stays put while
+# 1..m-1 rotate one step per round, so whoever sits at j and m-1-j meet. An odd count is padded
+# with a bye (index num_teams), whose pairing is left out.
+def round_robin_round(num_teams, round_idx):
+    m = num_teams + num_teams % 2
+    seat = [0] + [1 + (p - 1 - round_idx) % (m - 1) for p in range(1, m)]
+    return [(seat[j], seat[m - 1 - j]) for j in range(m // 2) if seat[j] < num_teams and seat[m - 1 - j] < num_teams]
+
+# Standard seeding order for a bracket of `size`: first-round pairs are (order[2i], order[2i + 1]) and
+# the top seeds can only meet in the last rounds.
+def bracket_order(size):
+    order = [0]
+    while len(order) < size: order = [s for seed in order for s in (seed, 2 * len(order) - 1 - seed)]
+    return order
+
+# Placeholders are parsed once, when the bracket graph is built:
+# "A1" -> (group 'A', rank 1), "1st Place" -> (league table, rank 1), "Winner Quarter-Final 3" -> winner of that fixture.
+def parse_placeholder(placeholder):
+    if not placeholder: return None
+    m = re.fullmatch(r"Winner (.+) (\d+)", placeholder)
+    if m: return ('winner', m.group(1), int(m.group(2)))
+    m = re.fullmatch(r"(\d+)(?:st|nd|rd|th) Place", placeholder)
+    if m: return ('rank', None, int(m.group(1)))
+    m = re.fullmatch(r"([A-Za-z]+)(\d+)", placeholder)
+    if m: return ('rank', m.group(1), int(m.group(2)))
+    return None
+
+# Stored on every fixture as stage_kind, so the group/league filters can use an index instead of LIKE.
+def classify_stage(stage):
+    if "Group" in (stage or ""): return 'group'
+    if "League" in (stage or ""): return 'league'
+    return 'knockout'
+
+# <<< BULK RESULT IMPORT: >>>
+# One record per line: team1, team2, team1_goals, team2_goals and optionally match_no (otherwise the
+# next unplayed team1-vs-team2 fixture) and team1_pso/team2_pso. CSV needs a header row.
+RESULT_IMPORT_REQUIRED = ('team1', 'team2', 'team1_goals', 'team2_goals')
+
+def result_file_format(filename=None, mimetype=None):
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == '.csv' or mimetype == 'text/csv': return 'csv'
+    if ext in ('.jsonl', '.ndjson') or mimetype in ('application/jsonl', 'application/x-ndjson', 'application/x-jsonlines'): return 'jsonl'
+    return None
+
+# Reads a text stream lazily and yields (line_no, record, error); error is set for unparseable lines.
+def read_result_records(stream, fmt):
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        missing = [c for c in RESULT_IMPORT_REQUIRED if c not in (reader.fieldnames or [])]
+        if missing:
+            yield 1, None, f"missing columns: {', '.join(missing)}"
+            return
+        for record in reader: yield reader.line_num, record, None
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip(): continue
+            try: record, error = json.loads(line), None
+            except ValueError as e: record, error = None, f"invalid JSON: {e}"
+            yield line_no, record, error
+    else:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+def parse_score(record, key, required=True):
+    value = record.get(key)
+    if value is None or str(value).strip() == "":
+        if required: raise ValueError(f"missing {key}")
+        return None
+    try: number = int(str(value).strip())
+    except ValueError: raise ValueError(f"{key} must be a whole number, got '{value}'") from None
+    if number < 0: raise ValueError(f"{key} must not be negative")
+    return number
+
+
+# --- CONNECTION MANAGEMENT ---
+# One writer connection (serialized by a lock, explicit BEGIN IMMEDIATE/COMMIT) and a pool of
+# read-only connections checked out per call. WAL lets the readers run while a write is in progress.
+# Writes can also be queued with submit(): a writer thread runs whatever has queued up as one
+# transaction (group commit), each command under its own savepoint.
+class ConnectionManager:
+    PRAGMAS = ("PRAGMA synchronous = NORMAL", "PRAGMA cache_size = -16000",
+               "PRAGMA mmap_size = 134217728", "PRAGMA busy_timeout = 5000", "PRAGMA temp_store = MEMORY")
+
+    def __init__(self, db_name, pool_size=8, trace=None, max_group=64, group_window=0.0):
+        self.db_uri = pathlib.Path(db_name).resolve().as_uri()
+        self.pool_size = pool_size
+        self.max_group = max_group  # commands per group commit
+        self.group_window = group_window  # seconds the writer thread waits for more commands before committing (0: take only what is queued)
+        self.trace = trace  # optional callback receiving every SQL statement run on any connection
+        self.profiler = None  # optional QueryProfiler; cursors are only wrapped while one is set
+        self._reset()
+
+    # Connections are opened lazily, and a forked worker drops the ones it inherited (without
+    # closing or using them, they belong to the parent) so every process gets its own.
+    def _reset(self):
+        self._pid = os.getpid()
+        self._write_conn = None
+        self._write_lock = threading.RLock()
+        self._readers = queue.LifoQueue()
+        self._local = threading.local()
+        self._commands = queue.Queue()
+        self._write_thread = None
+        self._write_thread_lock = threading.Lock()
+        self.groups_committed = self.commands_committed = 0
+
+    def _check_pid(self):
+        if self._pid != os.getpid(): self._reset()
+
+    def _connect(self, read_only=False):
+        conn = sqlite3.connect(self.db_uri + ("?mode=ro" if read_only else ""), uri=True, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if self.trace: conn.set_trace_callback(self.trace)
+        if not read_only: conn.execute("PRAGMA journal_mode = WAL")
+        for pragma in self.PRAGMAS: conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def writer(self):
+        self._check_pid()
+        with self._write_lock:
+            conn = getattr(self._local, 'write_conn', None)
+            if conn is not None:
+                # Nested call on the same thread: join the transaction that is already open.
+                yield self._cursor(conn)
+                return
+            if self._write_conn is None: self._write_conn = self._connect()
+            conn = self._write_conn
+            conn.execute("BEGIN IMMEDIATE")
+            self._local.write_conn = conn
+            try:
+                yield self._cursor(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._local.write_conn = None
+
+    @contextmanager
+    def reader(self):
+        self._check_pid()
+        conn = getattr(self._local, 'write_conn', None)
+        if conn is not None:
+            # Reads inside an open write transaction must see its uncommitted rows.
+            yield self._cursor(conn)
+            return
+        try: conn = self._readers.get_nowait()
+        except queue.Empty: conn = self._connect(read_only=True)
+        try:
+            yield self._cursor(conn)
+        finally:
+            if self._readers.qsize() < self.pool_size: self._readers.put(conn)
+            else: conn.close()
+
+    # Queues command(*args, **kwargs) for the writer thread and returns a Future, resolved once the
+    # group it ran in has committed. A command that raises is rolled back alone (to its savepoint) and
+    # its future gets the exception; the rest of the group still commits. Called from inside a write
+    # transaction (including from a command), it runs right away as part of that transaction.
+    def submit(self, command, *args, **kwargs):
+        self._check_pid()
+        future = Future()
+        if self.in_write_transaction():
+            future.set_running_or_notify_cancel()
+            try: future.set_result(command(*args, **kwargs))
+            except Exception as e: future.set_exception(e)
+            return future
+        with self._write_thread_lock:
+            if self._write_thread is None:
+                self._write_thread = threading.Thread(target=self._write_loop, args=(self._commands,), name='sqlite-writer', daemon=True)
+                self._write_thread.start()
+        self._commands.put((future, command, args, kwargs))
+        return future
+
+    # True on a thread whose writes (and reads) currently go through an open, uncommitted transaction.
+    def in_write_transaction(self):
+        return getattr(self._local, 'write_conn', None) is not None
+
+    def _write_loop(self, commands):
+        while True:
+            group = [commands.get()]
+            deadline = time.monotonic() + self.group_window
+            while len(group) < self.max_group:
+                wait = deadline - time.monotonic()
+                try: group.append(commands.get(timeout=wait) if wait > 0 else commands.get_nowait())
+                except queue.Empty: break
+            outcomes = []
+            try:
+                with self.writer() as cur:
+                    for future, command, args, kwargs in group:
+                        if not future.set_running_or_notify_cancel(): continue
+                        cur.execute("SAVEPOINT command")
+                        try:
+                            outcomes.append((future, command(*args, **kwargs), None))
+                        except BaseException as e:
+                            # Including SystemExit/KeyboardInterrupt from a command: fail that command, not the writer.
+                            cur.execute("ROLLBACK TO command")
+                            outcomes.append((future, None, e))
+                        cur.execute("RELEASE command")
+            except BaseException as e:
+                # The transaction itself failed: nothing in the group was written. The loop keeps running
+                # so later commands (and their waiting requests) are still served.
+                errors = {id(future): error for future, result, error in outcomes if error is not None}
+                for future, *_ in group:
+                    if not future.done(): future.set_exception(errors.get(id(future), e))
+                continue
+            self.groups_committed += 1
+            self.commands_committed += len(outcomes)
+            for future, result, error in outcomes:
+                if error is None: future.set_result(result)
+                else: future.set_exception(error)
+
+    def _cursor(self, conn):
+        return TimedCursor(conn.cursor(), self.profiler) if self.profiler else conn.cursor()
+
+    def close(self):
+        self._check_pid()
+        while not self._readers.empty(): self._readers.get_nowait().close()
+        with self._write_lock:
+            if self._write_conn is not None: self._write_conn.close()
+            self._write_conn = None
+
+
+# --- SQL INSTRUMENTATION (optional, see ConnectionManager.profiler) ---
+# Cursor proxy that times execute/executemany and the fetches that step the statement.
+class TimedCursor:
+    __slots__ = ('_cursor', '_profiler', '_sql')
+
+    def __init__(self, cursor, profiler):
+        self._cursor, self._profiler, self._sql = cursor, profiler, None
+
+    def _timed(self, method, *args, new_statement=False):
+        start = time.perf_counter()
+        try: return method(*args)
+        finally: self._profiler.record(self._sql, time.perf_counter() - start, new_statement)
+
+    def execute(self, sql, params=()):
+        self._sql = sql
+        self._timed(self._cursor.execute, sql, params, new_statement=True)
+        return self
+
+    def executemany(self, sql, rows):
+        self._sql = sql
+        self._timed(self._cursor.executemany, sql, rows, new_statement=True)
+        return self
+
+    def fetchone(self): return self._timed(self._cursor.fetchone)
+    def fetchall(self): return self._timed(self._cursor.fetchall)
+    def fetchmany(self, size=None): return self._timed(self._cursor.fetchmany, *([size] if size else []))
+    def __iter__(self): return iter(self.fetchall())
+    def __getattr__(self, name): return getattr(self._cursor, name)
+
+# Slow statements are logged here as warnings (stderr unless the server configures logging).
+sql_log = logging.getLogger('therrc.sql')
+
+# Collects per-thread statistics between start() and stop() (one request). Statements run outside
+# a request are only checked against the slow-query threshold.
+class QueryProfiler:
+    def __init__(self, slow_ms=None, keep=5):
+        self.slow_ms = slow_ms
+        self.keep = keep
+        self._local = threading.local()
+
+    def start(self):
+        self._local.stats = {'queries': 0, 'seconds': 0.0, 'statements': {}}
+
+    # Returns {'queries', 'seconds', 'slowest': [(seconds, sql), ...]} for the thread's current request.
+    def stop(self):
+        stats = getattr(self._local, 'stats', None)
+        self._local.stats = None
+        if stats is None: return None
+        slowest = sorted(((t, sql) for sql, t in stats['statements'].items()), reverse=True)[:self.keep]
+        return {'queries': stats['queries'], 'seconds': stats['seconds'], 'slowest': slowest}
+
+    # SQL seconds spent so far in the thread's current request.
+    def current_seconds(self):
+        stats = getattr(self._local, 'stats', None)
+        return stats['seconds'] if stats else 0.0
+
+    # The thread's current request stats, for attach() on a thread that works on the request's behalf.
+    def current(self):
+        return getattr(self._local, 'stats', None)
+
+    # Records this thread's queries into `stats` (another thread's request) for the duration of the block.
+    @contextmanager
+    def attach(self, stats):
+        previous = getattr(self._local, 'stats', None)
+        self._local.stats = stats
+        try: yield
+        finally: self._local.stats = previous
+
+    def record(self, sql, seconds, new_statement):
+        stats = getattr(self._local, 'stats', None)
+        if stats is None:
+            if self.slow_ms is not None and seconds * 1000 >= self.slow_ms: self.log_slow(seconds, sql)
+            return
+        if new_statement: stats['queries'] += 1
+        stats['seconds'] += seconds
+        key = " ".join(str(sql).split())
+        stats['statements'][key] = stats['statements'].get(key, 0.0) + seconds
+
+    def log_slow(self, seconds, sql, context=""):
+        sql_log.warning("slow query %.1f ms%s: %s", seconds * 1000, context, ' '.join(str(sql).split()))
+
+
+# --- DATABASE MANAGER CLASS ---
 class DatabaseManager:
-    def __init__(self, db_name):
-        self.conn = sqlite3.connect(db_name, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-        self.cursor = self.conn.cursor()
-        self.create_tables()
+    # Constructing a manager opens nothing; the schema is set up by an explicit create_tables()
+    # (`flask --app app init-db`), not as a side effect of importing the app.
+    def __init__(self, db_name, trace=None):
+        self.connections = ConnectionManager(db_name, trace=trace)
+        self.standings = StandingsEngine(self)
+
+    # --- SCHEMA MIGRATIONS ---
+    # Applied in order; PRAGMA user_version records how many have run. Every step is idempotent
+    # because databases from before this layer carry some of its changes already.
+    def migrations(self):
+        return [self._migrate_base_tables, self._migrate_bracket_slots, self._migrate_versioning,
+                self._migrate_change_seq, self._migrate_stage_kind_and_indexes, self._migrate_all_time_tables,
+                self._migrate_archives, self._migrate_pair_index, self._migrate_bracket_built]
 
     def create_tables(self):
-        self.cursor.execute('''CREATE TABLE IF NOT EXISTS tournaments (
-                                tournament_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                season_number INTEGER NOT NULL,
-                                created_date TEXT,
-                                settings TEXT 
-                             )''')
-        self.cursor.execute('''CREATE TABLE IF NOT EXISTS teams (
-                                team_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                tournament_id INTEGER NOT NULL,
-                                team_name TEXT NOT NULL, 
-                                group_name TEXT,
-                                matches_played INTEGER DEFAULT 0, wins INTEGER DEFAULT 0,
-                                draws INTEGER DEFAULT 0, losses INTEGER DEFAULT 0,
-                                goals_for INTEGER DEFAULT 0, goals_against INTEGER DEFAULT 0,
-                                FOREIGN KEY(tournament_id) REFERENCES tournaments(tournament_id) ON DELETE CASCADE,
-                                UNIQUE(tournament_id, team_name)
-                             )''')
-        self.cursor.execute('''CREATE TABLE IF NOT EXISTS fixtures (
-                                match_no INTEGER PRIMARY KEY AUTOINCREMENT,
-                                tournament_id INTEGER NOT NULL,
-                                team1_id INTEGER, team2_id INTEGER,
-                                placeholder_t1 TEXT, placeholder_t2 TEXT,
-                                team1_goals INTEGER, team2_goals INTEGER,
-                                team1_pso INTEGER, team2_pso INTEGER,
-                                status TEXT DEFAULT 'Not Played', stage TEXT, round_in_stage INTEGER,
-                                FOREIGN KEY(tournament_id) REFERENCES tournaments(tournament_id) ON DELETE CASCADE,
-                                FOREIGN KEY(team1_id) REFERENCES teams(team_id),
-                                FOREIGN KEY(team2_id) REFERENCES teams(team_id)
-                             )''')
-        self.conn.commit()
-
-    def recalculate_team_stats(self, team_id):
-        self.cursor.execute("UPDATE teams SET matches_played=0, wins=0, draws=0, losses=0, goals_for=0, goals_against=0 WHERE team_id = ?", (team_id,))
-        self.cursor.execute("SELECT * FROM fixtures WHERE (team1_id = ? OR team2_id = ?) AND status = 'Played' AND (stage LIKE 'Group%' OR stage = 'League')", (team_id, team_id))
-        played_fixtures = self.cursor.fetchall()
-        stats = {'mp': 0, 'w': 0, 'd': 0, 'l': 0, 'gf': 0, 'ga': 0}
-        for match in played_fixtures:
-            stats['mp'] += 1
-            if match['team1_id'] == team_id:
-                stats['gf'] += match['team1_goals']
-                stats['ga'] += match['team2_goals']
-                if match['team1_goals'] > match['team2_goals']: stats['w'] += 1
-                elif match['team1_goals'] == match['team2_goals']: stats['d'] += 1
-                else: stats['l'] += 1
-            else:
-                stats['gf'] += match['team2_goals']
-                stats['ga'] += match['team1_goals']
-                if match['team2_goals'] > match['team1_goals']: stats['w'] += 1
-                elif match['team1_goals'] == match['team2_goals']: stats['d'] += 1
-                else: stats['l'] += 1
-        self.cursor.execute("UPDATE teams SET matches_played=?, wins=?, draws=?, losses=?, goals_for=?, goals_against=? WHERE team_id = ?", (stats['mp'], stats['w'], stats['d'], stats['l'], stats['gf'], stats['ga'], team_id))
-        self.conn.commit()
-        
-    def create_new_tournament(self, season_number, settings_json):
-        date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.cursor.execute("INSERT INTO tournaments (season_number, created_date, settings) VALUES (?, ?, ?)", (season_number, date, settings_json))
-        self.conn.commit()
-        return self.cursor.lastrowid
+        migrations = self.migrations()
+        with self.connections.writer() as cur:
+            cur.execute("PRAGMA user_version")
+            current = cur.fetchone()[0]
+            for migrate in migrations[current:]: migrate(cur)
+            if current < len(migrations): cur.execute(f"PRAGMA user_version = {len(migrations)}")
+
+    # False for a missing database file (read-only connections cannot create it) or an old schema.
+    def schema_is_current(self):
+        try:
+            with self.connections.reader() as cur:
+                cur.execute("PRAGMA user_version")
+                return cur.fetchone()[0] >= len(self.migrations())
+        except sqlite3.OperationalError:
+            return False
+
+    def _migrate_base_tables(self, cur):
+        cur.execute('''CREATE TABLE IF NOT EXISTS tournaments (
+                            tournament_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            season_number INTEGER NOT NULL,
+                            created_date TEXT,
+                            settings TEXT 
+                         )''')
+        cur.execute('''CREATE TABLE IF NOT EXISTS teams (
+                            team_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            tournament_id INTEGER NOT NULL,
+                            team_name TEXT NOT NULL, 
+                            group_name TEXT,
+                            matches_played INTEGER DEFAULT 0, wins INTEGER DEFAULT 0,
+                            draws INTEGER DEFAULT 0, losses INTEGER DEFAULT 0,
+                            goals_for INTEGER DEFAULT 0, goals_against INTEGER DEFAULT 0,
+                            FOREIGN KEY(tournament_id) REFERENCES tournaments(tournament_id) ON DELETE CASCADE,
+                            UNIQUE(tournament_id, team_name)
+                         )''')
+        cur.execute('''CREATE TABLE IF NOT EXISTS fixtures (
+                            match_no INTEGER PRIMARY KEY AUTOINCREMENT,
+                            tournament_id INTEGER NOT NULL,
+                            team1_id INTEGER, team2_id INTEGER,
+                            placeholder_t1 TEXT, placeholder_t2 TEXT,
+                            team1_goals INTEGER, team2_goals INTEGER,
+                            team1_pso INTEGER, team2_pso INTEGER,
+                            status TEXT DEFAULT 'Not Played', stage TEXT, round_in_stage INTEGER,
+                            FOREIGN KEY(tournament_id) REFERENCES tournaments(tournament_id) ON DELETE CASCADE,
+                            FOREIGN KEY(team1_id) REFERENCES teams(team_id),
+                            FOREIGN KEY(team2_id) REFERENCES teams(team_id)
+                         )''')
+
+    # Bracket graph: each knockout slot (fixture + side) and the standings position or fixture winner that fills it.
+    def _migrate_bracket_slots(self, cur):
+        cur.execute('''CREATE TABLE IF NOT EXISTS bracket_slots (
+                            tournament_id INTEGER NOT NULL,
+                            match_no INTEGER NOT NULL, side INTEGER NOT NULL,
+                            placeholder TEXT NOT NULL,
+                            source_group TEXT, source_rank INTEGER,
+                            source_match_no INTEGER,
+                            PRIMARY KEY(match_no, side),
+                            FOREIGN KEY(tournament_id) REFERENCES tournaments(tournament_id) ON DELETE CASCADE,
+                            FOREIGN KEY(match_no) REFERENCES fixtures(match_no),
+                            FOREIGN KEY(source_match_no) REFERENCES fixtures(match_no)
+                         )''')
+
+    def _migrate_versioning(self, cur):
+        self._add_column_if_missing(cur, 'tournaments', 'version', 'INTEGER NOT NULL DEFAULT 0')
+
+    # change_seq: the tournament version at which the row last changed (0 = before versioning)
+    def _migrate_change_seq(self, cur):
+        self._add_column_if_missing(cur, 'fixtures', 'change_seq', 'INTEGER NOT NULL DEFAULT 0')
+        self._add_column_if_missing(cur, 'teams', 'change_seq', 'INTEGER NOT NULL DEFAULT 0')
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_fixtures_change_seq ON fixtures(tournament_id, change_seq)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_teams_change_seq ON teams(tournament_id, change_seq)")
+
+    # Indexes for the hot lookups (see check_query_plans) and the stored stage kind they filter on.
+    def _migrate_stage_kind_and_indexes(self, cur):
+        self._add_column_if_missing(cur, 'fixtures', 'stage_kind', "TEXT NOT NULL DEFAULT 'knockout'")
+        cur.execute('''UPDATE fixtures SET stage_kind = CASE WHEN instr(stage, 'Group') > 0 THEN 'group'
+                                                       WHEN instr(stage, 'League') > 0 THEN 'league' ELSE 'knockout' END''')
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_fixtures_tournament ON fixtures(tournament_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_fixtures_stage_kind ON fixtures(tournament_id, stage_kind, status)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_fixtures_team1 ON fixtures(team1_id, status)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_fixtures_team2 ON fixtures(team2_id, status)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_teams_group ON teams(tournament_id, group_name)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_bracket_slots_tournament ON bracket_slots(tournament_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_bracket_slots_source ON bracket_slots(source_match_no)")
+
+    # Cross-season aggregates keyed by team name (names are stored uppercased), backfilled from the existing results.
+    def _migrate_all_time_tables(self, cur):
+        cur.execute('''CREATE TABLE IF NOT EXISTS all_time_standings (
+                            team_name TEXT PRIMARY KEY,
+                            matches_played INTEGER NOT NULL DEFAULT 0, wins INTEGER NOT NULL DEFAULT 0,
+                            draws INTEGER NOT NULL DEFAULT 0, losses INTEGER NOT NULL DEFAULT 0,
+                            goals_for INTEGER NOT NULL DEFAULT 0, goals_against INTEGER NOT NULL DEFAULT 0
+                         ) WITHOUT ROWID''')
+        cur.execute('''CREATE TABLE IF NOT EXISTS head_to_head (
+                            team_a TEXT NOT NULL, team_b TEXT NOT NULL,
+                            matches_played INTEGER NOT NULL DEFAULT 0, a_wins INTEGER NOT NULL DEFAULT 0,
+                            draws INTEGER NOT NULL DEFAULT 0, b_wins INTEGER NOT NULL DEFAULT 0,
+                            a_goals INTEGER NOT NULL DEFAULT 0, b_goals INTEGER NOT NULL DEFAULT 0,
+                            PRIMARY KEY(team_a, team_b)
+                         ) WITHOUT ROWID''')
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_all_time_rank ON all_time_standings({self.ALL_TIME_RANK})")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_teams_name ON teams(team_name)")
+        self._rebuild_all_time(cur)
 
+    # archived_version: the version a completed season was snapshotted at; purged: its live rows were dropped.
+    def _migrate_archives(self, cur):
+        self._add_column_if_missing(cur, 'tournaments', 'archived_version', 'INTEGER')
+        self._add_column_if_missing(cur, 'tournaments', 'purged', 'INTEGER NOT NULL DEFAULT 0')
+
+    # Head-to-head lookups of the standings engine (fixtures between two given teams).
+    def _migrate_pair_index(self, cur):
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_fixtures_pair ON fixtures(team1_id, team2_id)")
+
+    # bracket_built: the bracket graph was saved, possibly empty (a league or groups without a knockout stage).
+    def _migrate_bracket_built(self, cur):
+        self._add_column_if_missing(cur, 'tournaments', 'bracket_built', 'INTEGER NOT NULL DEFAULT 0')
+        cur.execute("UPDATE tournaments SET bracket_built = 1 WHERE tournament_id IN (SELECT tournament_id FROM bracket_slots)")
+
+    def _add_column_if_missing(self, cur, table, column, declaration):
+        cur.execute(f"PRAGMA table_info({table})")
+        if column not in [r['name'] for r in cur.fetchall()]:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+    # --- VERSIONING: every write path bumps its tournament's version, which keys the response caches ---
+    # The new version is returned so the rows written next can be stamped with it (change_seq).
+    def _bump_version(self, cur, tournament_id):
+        cur.execute("UPDATE tournaments SET version = version + 1 WHERE tournament_id = ?", (tournament_id,))
+        cur.execute("SELECT version FROM tournaments WHERE tournament_id = ?", (tournament_id,))
+        r = cur.fetchone()
+        return r['version'] if r else None
+
+    def get_tournament_version(self, tournament_id):
+        with self.connections.reader() as cur:
+            cur.execute("SELECT version FROM tournaments WHERE tournament_id = ?", (tournament_id,))
+            r = cur.fetchone()
+        return r['version'] if r else None
+
+    # Verify/repair: recompute every team's counters of a tournament from its played fixtures
+    # in one aggregate pass and rewrite only the rows that drifted. Returns the repaired team ids.
+    def rebuild_standings(self, tournament_id):
+        with self.connections.writer() as cur:
+            cur.execute('''SELECT team_id, COUNT(*) AS mp, SUM(gf > ga) AS w, SUM(gf = ga) AS d, SUM(gf < ga) AS l, SUM(gf) AS gf, SUM(ga) AS ga FROM (
+                               SELECT team1_id AS team_id, team1_goals AS gf, team2_goals AS ga FROM fixtures
+                               WHERE tournament_id = ? AND status = 'Played' AND stage_kind IN ('group', 'league')
+                               UNION ALL
+                               SELECT team2_id, team2_goals, team1_goals FROM fixtures
+                               WHERE tournament_id = ? AND status = 'Played' AND stage_kind IN ('group', 'league')
+                           ) GROUP BY team_id''', (tournament_id, tournament_id))
+            totals = {r['team_id']: (r['mp'], r['w'], r['d'], r['l'], r['gf'], r['ga']) for r in cur.fetchall()}
+            repaired = []
+            for team in self.get_all_teams(tournament_id):
+                expected = totals.get(team.team_id, (0, 0, 0, 0, 0, 0))
+                if expected != (team.matches_played, team.wins, team.draws, team.losses, team.goals_for, team.goals_against):
+                    repaired.append((*expected, team.team_id))
+            if repaired:
+                version = self._bump_version(cur, tournament_id)
+                cur.executemany("UPDATE teams SET matches_played=?, wins=?, draws=?, losses=?, goals_for=?, goals_against=?, change_seq=? WHERE team_id = ?",
+                                [(*row[:-1], version, row[-1]) for row in repaired])
+        return [row[-1] for row in repaired]
+
+    # Incremental standings: subtract the old result (if any) and add the new one for both teams.
+    def _apply_result_delta(self, cur, team1_id, team2_id, old_result, new_result, version):
+        deltas = {}
+        self._add_result_delta(deltas, team1_id, team2_id, old_result, new_result)
+        self._write_team_deltas(cur, deltas, version)
+
+    # Accumulates the counter changes (mp, w, d, l, gf, ga) per team_id, so many results can be written at once.
+    def _add_result_delta(self, deltas, team1_id, team2_id, old_result, new_result):
+        for result, sign in ((old_result, -1), (new_result, 1)):
+            if result is None: continue
+            g1, g2 = result
+            for team_id, gf, ga in ((team1_id, g1, g2), (team2_id, g2, g1)):
+                totals = deltas.setdefault(team_id, [0] * 6)
+                for i, c in enumerate((1, gf > ga, gf == ga, gf < ga, gf, ga)): totals[i] += sign * int(c)
+
+    def _write_team_deltas(self, cur, deltas, version):
+        cur.executemany('''UPDATE teams SET matches_played = matches_played + ?, wins = wins + ?, draws = draws + ?, losses = losses + ?,
+                           goals_for = goals_for + ?, goals_against = goals_against + ?, change_seq = ? WHERE team_id = ?''',
+                        [(*d, version, team_id) for team_id, d in deltas.items()])
+        
     def get_all_tournaments(self):
-        self.cursor.execute("SELECT tournament_id, season_number, created_date FROM tournaments ORDER BY season_number DESC")
-        return self.cursor.fetchall()
+        with self.connections.reader() as cur:
+            cur.execute("SELECT tournament_id, season_number, created_date FROM tournaments ORDER BY season_number DESC")
+            return cur.fetchall()
 
     def get_tournament_by_id(self, tournament_id):
-        self.cursor.execute("SELECT * FROM tournaments WHERE tournament_id = ?", (tournament_id,))
-        return self.cursor.fetchone()
+        with self.connections.reader() as cur:
+            cur.execute("SELECT * FROM tournaments WHERE tournament_id = ?", (tournament_id,))
+            return cur.fetchone()
 
-    def delete_tournament(self, tournament_id):
-        self.cursor.execute("DELETE FROM tournaments WHERE tournament_id = ?", (tournament_id,))
-        self.conn.commit()
+    # archived_results: (team1_name, team2_name, (goals1, goals2)) of a purged season, read from its snapshot.
+    def delete_tournament(self, tournament_id, archived_results=()):
+        with self.connections.writer() as cur:
+            # The season's results leave the all-time tables with it.
+            cur.execute(f"{self.PLAYED_WITH_NAMES} AND f.tournament_id = ?", (tournament_id,))
+            changes = [(r['team1_name'], r['team2_name'], (r['team1_goals'], r['team2_goals']), None) for r in cur.fetchall()]
+            self._apply_all_time_changes(cur, changes + [(name1, name2, result, None) for name1, name2, result in archived_results])
+            cur.execute("DELETE FROM tournaments WHERE tournament_id = ?", (tournament_id,))
         
-    def add_team(self, tournament_id, team_name, group_name):
-        try:
-            self.cursor.execute("INSERT INTO teams (tournament_id, team_name, group_name) VALUES (?, ?, ?)", (tournament_id, team_name, group_name))
-            self.conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
-    
-    def add_fixture(self, tournament_id, t1_id, t2_id, p1, p2, stage, round_in_stage):
-        self.cursor.execute("INSERT INTO fixtures (tournament_id, team1_id, team2_id, placeholder_t1, placeholder_t2, stage, round_in_stage) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                            (tournament_id, t1_id, t2_id, p1, p2, stage, round_in_stage))
-        self.conn.commit()
-
-    def get_all_fixtures(self, tournament_id):
-        self.cursor.execute("SELECT * FROM fixtures WHERE tournament_id = ? ORDER BY match_no ASC", (tournament_id,))
-        rows = self.cursor.fetchall()
-        matches = []
-        for r in rows:
-            t1 = self.get_team_by_id(r['team1_id']) if r['team1_id'] is not None else None
-            t2 = self.get_team_by_id(r['team2_id']) if r['team2_id'] is not None else None
-            matches.append(Match(db_manager=self, **dict(r), team1=t1, team2=t2))
-        return matches
+    # Unit of work: everything written through the yielded BatchWriter lands in one transaction,
+    # or nothing does.
+    @contextmanager
+    def batch(self):
+        with self.connections.writer() as cur:
+            yield BatchWriter(cur, self)
+
+    # Queues a write for group commit on the writer thread; see ConnectionManager.submit.
+    def submit(self, command, *args, **kwargs):
+        return self.connections.submit(command, *args, **kwargs)
+
+    def get_all_fixtures(self, tournament_id, team_map=None):
+        if team_map is None: team_map = self.get_team_map(tournament_id)
+        with self.connections.reader() as cur:
+            cur.execute("SELECT * FROM fixtures WHERE tournament_id = ? ORDER BY match_no ASC", (tournament_id,))
+            rows = cur.fetchall()
+        return [self._build_match(r, team_map) for r in rows]
 
     def get_fixture_by_id(self, match_no):
-        self.cursor.execute("SELECT * FROM fixtures WHERE match_no=?", (match_no,))
-        r = self.cursor.fetchone()
+        with self.connections.reader() as cur:
+            cur.execute("SELECT * FROM fixtures WHERE match_no=?", (match_no,))
+            r = cur.fetchone()
         if not r: return None
-        t1 = self.get_team_by_id(r['team1_id']) if r['team1_id'] is not None else None
-        t2 = self.get_team_by_id(r['team2_id']) if r['team2_id'] is not None else None
-        return Match(db_manager=self, **dict(r), team1=t1, team2=t2)
-    
+        return self._build_match(r, self.get_team_map(r['tournament_id']))
+
     def get_all_teams(self, tournament_id):
-        self.cursor.execute("SELECT * FROM teams WHERE tournament_id=?", (tournament_id,))
-        rows = self.cursor.fetchall()
+        with self.connections.reader() as cur:
+            cur.execute("SELECT * FROM teams WHERE tournament_id=?", (tournament_id,))
+            rows = cur.fetchall()
         return [Team(**dict(r)) for r in rows]
+
+    # Identity map: one Team object per team_id, shared by every Match of the tournament.
+    def get_team_map(self, tournament_id):
+        return {team.team_id: team for team in self.get_all_teams(tournament_id)}
+
+    def _build_match(self, row, team_map):
+        t1 = team_map.get(row['team1_id']) if row['team1_id'] is not None else None
+        t2 = team_map.get(row['team2_id']) if row['team2_id'] is not None else None
+        return Match(**dict(row), team1=t1, team2=t2)
     
     def get_team_by_id(self, team_id):
-        self.cursor.execute("SELECT * FROM teams WHERE team_id=?", (team_id,))
-        r = self.cursor.fetchone()
+        with self.connections.reader() as cur:
+            cur.execute("SELECT * FROM teams WHERE team_id=?", (team_id,))
+            r = cur.fetchone()
         return Team(**dict(r)) if r else None
 
-    def update_team_stats(self, team):
-        self.cursor.execute("UPDATE teams SET matches_played = ?, wins = ?, draws = ?, losses = ?, goals_for = ?, goals_against = ? WHERE team_id = ?",
-                            (team.matches_played, team.wins, team.draws, team.losses, team.goals_for, team.goals_against, team.team_id))
-        self.conn.commit()
+    # Enters (or corrects) a fixture's result: updates the Match in place and writes it, moving the
+    # standings by the difference from the previous result.
+    def record_result(self, match, team1_goals, team2_goals, pso_t1=None, pso_t2=None):
+        old_result = match.set_result(team1_goals, team2_goals, pso_t1, pso_t2)
+        self.update_fixture_result(match, old_result)
+
+    def update_fixture_result(self, match, old_result=None):
+        with self.connections.writer() as cur:
+            version = self._bump_version(cur, match.tournament_id)
+            cur.execute("UPDATE fixtures SET team1_goals = ?, team2_goals = ?, team1_pso = ?, team2_pso = ?, status = 'Played', change_seq = ? WHERE match_no = ?",
+                        (match.team1_goals, match.team2_goals, match.team1_pso, match.team2_pso, version, match.match_no))
+            if match.team1 and match.team2 and match.is_initial_stage:
+                self._apply_result_delta(cur, match.team1.team_id, match.team2.team_id, old_result, (match.team1_goals, match.team2_goals), version)
+            if match.team1 and match.team2:
+                self._apply_all_time_changes(cur, [(match.team1.name, match.team2.name, old_result, (match.team1_goals, match.team2_goals))])
+
+    # --- BRACKET GRAPH ---
+    # slot_rows: iterable of (match_no, side, placeholder, source_group, source_rank, source_match_no)
+    def save_bracket_slots(self, tournament_id, slot_rows):
+        with self.connections.writer() as cur:
+            cur.execute("DELETE FROM bracket_slots WHERE tournament_id = ?", (tournament_id,))
+            cur.executemany("INSERT INTO bracket_slots (tournament_id, match_no, side, placeholder, source_group, source_rank, source_match_no) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            ((tournament_id, *row) for row in slot_rows))
+            cur.execute("UPDATE tournaments SET bracket_built = 1 WHERE tournament_id = ?", (tournament_id,))
+
+    def get_bracket_slots(self, tournament_id):
+        with self.connections.reader() as cur:
+            cur.execute("SELECT * FROM bracket_slots WHERE tournament_id = ? ORDER BY match_no, side", (tournament_id,))
+            return cur.fetchall()
+
+    def is_bracket_built(self, tournament_id):
+        with self.connections.reader() as cur:
+            cur.execute("SELECT bracket_built FROM tournaments WHERE tournament_id = ?", (tournament_id,))
+            r = cur.fetchone()
+        return bool(r and r['bracket_built'])
+
+    # True once a knockout fixture seeded from a group/league rank has been played.
+    def has_played_rank_slot(self, tournament_id):
+        with self.connections.reader() as cur:
+            cur.execute('''SELECT 1 FROM bracket_slots s JOIN fixtures f ON f.match_no = s.match_no
+                           WHERE s.tournament_id = ? AND s.source_rank IS NOT NULL AND f.status = 'Played' LIMIT 1''', (tournament_id,))
+            return cur.fetchone() is not None
+
+    # Slots whose target fixture has not been played yet, with the team currently sitting in them.
+    def get_open_bracket_slots(self, tournament_id):
+        with self.connections.reader() as cur:
+            cur.execute('''SELECT s.*, CASE s.side WHEN 1 THEN f.team1_id ELSE f.team2_id END AS current_team_id
+                           FROM bracket_slots s JOIN fixtures f ON f.match_no = s.match_no
+                           WHERE s.tournament_id = ? AND f.status != 'Played' ''', (tournament_id,))
+            return cur.fetchall()
+
+    # Group/league fixtures that still need a result and already have both teams.
+    def get_pending_initial_fixtures(self, tournament_id):
+        with self.connections.reader() as cur:
+            cur.execute("SELECT match_no, team1_id, team2_id FROM fixtures WHERE tournament_id = ? AND status = 'Not Played' AND stage_kind IN ('group', 'league') AND team1_id IS NOT NULL AND team2_id IS NOT NULL ORDER BY match_no", (tournament_id,))
+            return cur.fetchall()
+
+    # (total, pending) group/league fixtures of a tournament.
+    def get_initial_stage_progress(self, tournament_id):
+        with self.connections.reader() as cur:
+            cur.execute("SELECT COUNT(*) AS total, COALESCE(SUM(status != 'Played'), 0) AS pending FROM fixtures WHERE tournament_id = ? AND stage_kind IN ('group', 'league')", (tournament_id,))
+            r = cur.fetchone()
+        return r['total'], r['pending']
+
+    def get_fixture_rows(self, match_nos):
+        match_nos = list(match_nos)
+        if not match_nos: return {}
+        with self.connections.reader() as cur:
+            cur.execute(f"SELECT * FROM fixtures WHERE match_no IN ({','.join('?' * len(match_nos))})", match_nos)
+            return {r['match_no']: r for r in cur.fetchall()}
+
+    # fills: iterable of (match_no, side, team_id); applied with one executemany per side and one version bump.
+    def fill_bracket_slots(self, tournament_id, fills):
+        fills = list(fills)
+        if not fills: return
+        with self.connections.writer() as cur:
+            version = self._bump_version(cur, tournament_id)
+            cur.executemany("UPDATE fixtures SET team1_id = ?, placeholder_t1 = NULL, change_seq = ? WHERE match_no = ?", [(t, version, m) for m, side, t in fills if side == 1])
+            cur.executemany("UPDATE fixtures SET team2_id = ?, placeholder_t2 = NULL, change_seq = ? WHERE match_no = ?", [(t, version, m) for m, side, t in fills if side == 2])
+
+    # --- ALL-TIME AGGREGATES ---
+    # all_time_standings (per team name) and head_to_head (per name pair, team_a < team_b) count every played
+    # fixture with both teams, knockouts included (a shoot-out counts as a draw). Every result write updates
+    # them in its own transaction; rebuild_all_time recomputes both from the fixtures.
+    ALL_TIME_RANK = "wins * 3 + draws DESC, goals_for - goals_against DESC, goals_for DESC, team_name"
+    PLAYED_WITH_NAMES = '''SELECT t1.team_name AS team1_name, t2.team_name AS team2_name, f.team1_goals, f.team2_goals
+                           FROM fixtures f JOIN teams t1 ON t1.team_id = f.team1_id JOIN teams t2 ON t2.team_id = f.team2_id
+                           WHERE f.status = 'Played' '''
+
+    # Accumulates one result change into per-name and per-pair totals (mp, w, d, l, gf, ga) from the
+    # first team's side; results are (goals1, goals2) or None.
+    def _add_all_time_change(self, standings, head_to_head, name1, name2, old_result, new_result):
+        self._add_result_delta(standings, name1, name2, old_result, new_result)
+        if name1 > name2:
+            name1, name2 = name2, name1
+            old_result, new_result = old_result and old_result[::-1], new_result and new_result[::-1]
+        for result, sign in ((old_result, -1), (new_result, 1)):
+            if result is None: continue
+            ga, gb = result
+            totals = head_to_head.setdefault((name1, name2), [0] * 6)
+            for i, c in enumerate((1, ga > gb, ga == gb, ga < gb, ga, gb)): totals[i] += sign * int(c)
+
+    def _write_all_time(self, cur, standings, head_to_head):
+        cur.executemany('''INSERT INTO all_time_standings (team_name, matches_played, wins, draws, losses, goals_for, goals_against) VALUES (?, ?, ?, ?, ?, ?, ?)
+                           ON CONFLICT(team_name) DO UPDATE SET matches_played = matches_played + excluded.matches_played, wins = wins + excluded.wins,
+                           draws = draws + excluded.draws, losses = losses + excluded.losses, goals_for = goals_for + excluded.goals_for,
+                           goals_against = goals_against + excluded.goals_against''', [(name, *d) for name, d in standings.items()])
+        cur.executemany('''INSERT INTO head_to_head (team_a, team_b, matches_played, a_wins, draws, b_wins, a_goals, b_goals) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                           ON CONFLICT(team_a, team_b) DO UPDATE SET matches_played = matches_played + excluded.matches_played, a_wins = a_wins + excluded.a_wins,
+                           draws = draws + excluded.draws, b_wins = b_wins + excluded.b_wins, a_goals = a_goals + excluded.a_goals,
+                           b_goals = b_goals + excluded.b_goals''', [(*pair, *d) for pair, d in head_to_head.items()])
+        # Names or pairs whose last result was removed (a deleted season) drop out of the tables.
+        cur.executemany("DELETE FROM all_time_standings WHERE team_name = ? AND matches_played = 0", [(name,) for name, d in standings.items() if d[0] < 0])
+        cur.executemany("DELETE FROM head_to_head WHERE team_a = ? AND team_b = ? AND matches_played = 0", [pair for pair, d in head_to_head.items() if d[0] < 0])
+
+    # changes: iterable of (team1_name, team2_name, old_result, new_result).
+    def _apply_all_time_changes(self, cur, changes):
+        standings, head_to_head = {}, {}
+        for change in changes: self._add_all_time_change(standings, head_to_head, *change)
+        self._write_all_time(cur, standings, head_to_head)
+
+    def _rebuild_all_time(self, cur):
+        cur.execute("DELETE FROM all_time_standings")
+        cur.execute("DELETE FROM head_to_head")
+        played = f"{self.PLAYED_WITH_NAMES} AND f.tournament_id IN (SELECT tournament_id FROM tournaments)"
+        cur.execute(f'''INSERT INTO all_time_standings (team_name, matches_played, wins, draws, losses, goals_for, goals_against)
+                        SELECT name, COUNT(*), SUM(gf > ga), SUM(gf = ga), SUM(gf < ga), SUM(gf), SUM(ga) FROM (
+                            SELECT team1_name AS name, team1_goals AS gf, team2_goals AS ga FROM ({played})
+                            UNION ALL SELECT team2_name, team2_goals, team1_goals FROM ({played})
+                        ) GROUP BY name''')
+        cur.execute(f'''INSERT INTO head_to_head (team_a, team_b, matches_played, a_wins, draws, b_wins, a_goals, b_goals)
+                        SELECT a, b, COUNT(*), SUM(ga > gb), SUM(ga = gb), SUM(ga < gb), SUM(ga), SUM(gb) FROM (
+                            SELECT min(team1_name, team2_name) AS a, max(team1_name, team2_name) AS b,
+                                   CASE WHEN team1_name < team2_name THEN team1_goals ELSE team2_goals END AS ga,
+                                   CASE WHEN team1_name < team2_name THEN team2_goals ELSE team1_goals END AS gb
+                            FROM ({played})
+                        ) GROUP BY a, b''')
+
+    # Recomputes both tables from scratch; returns the number of teams in the all-time table.
+    # Purged seasons have no rows left, so their results are passed in from their snapshots.
+    def rebuild_all_time(self, archived_results=()):
+        with self.connections.writer() as cur:
+            self._rebuild_all_time(cur)
+            self._apply_all_time_changes(cur, ((name1, name2, None, result) for name1, name2, result in archived_results))
+            cur.execute("SELECT COUNT(*) FROM all_time_standings")
+            return cur.fetchone()[0]
+
+    def get_all_time_standings(self, limit=100, offset=0):
+        with self.connections.reader() as cur:
+            cur.execute(f'''SELECT team_name AS name, matches_played, wins, draws, losses, goals_for, goals_against,
+                                   goals_for - goals_against AS goal_difference, wins * 3 + draws AS points
+                            FROM all_time_standings ORDER BY {self.ALL_TIME_RANK} LIMIT ? OFFSET ?''', (limit, offset))
+            return [dict(r) for r in cur]
+
+    # The record between two teams from team1's side, or None if they never met.
+    def get_head_to_head(self, team1_name, team2_name):
+        a, b = sorted((team1_name, team2_name))
+        with self.connections.reader() as cur:
+            cur.execute("SELECT * FROM head_to_head WHERE team_a = ? AND team_b = ?", (a, b))
+            r = cur.fetchone()
+        if r is None: return None
+        swap = team1_name != a
+        return {'team1': team1_name, 'team2': team2_name, 'matches_played': r['matches_played'],
+                'team1_wins': r['b_wins'] if swap else r['a_wins'], 'draws': r['draws'], 'team2_wins': r['a_wins'] if swap else r['b_wins'],
+                'team1_goals': r['b_goals'] if swap else r['a_goals'], 'team2_goals': r['a_goals'] if swap else r['b_goals']}
+
+    def get_all_time_team(self, team_name):
+        with self.connections.reader() as cur:
+            cur.execute('''SELECT team_name AS name, matches_played, wins, draws, losses, goals_for, goals_against,
+                                  goals_for - goals_against AS goal_difference, wins * 3 + draws AS points
+                           FROM all_time_standings WHERE team_name = ?''', (team_name,))
+            r = cur.fetchone()
+        return dict(r) if r else None
+
+    # One row per season the team entered, with its group/league record there.
+    def get_team_history(self, team_name):
+        with self.connections.reader() as cur:
+            cur.execute('''SELECT tr.tournament_id, tr.season_number, t.group_name, t.matches_played, t.wins, t.draws, t.losses,
+                                  t.goals_for, t.goals_against, t.goals_for - t.goals_against AS goal_difference, t.wins * 3 + t.draws AS points
+                           FROM teams t JOIN tournaments tr ON tr.tournament_id = t.tournament_id
+                           WHERE t.team_name = ? ORDER BY tr.season_number''', (team_name,))
+            return [dict(r) for r in cur]
+
+    # --- ARCHIVES: completed seasons frozen to snapshot files (written by the app, see app.py) ---
+    def get_tournament_state(self, tournament_id):
+        with self.connections.reader() as cur:
+            cur.execute("SELECT version, archived_version, purged FROM tournaments WHERE tournament_id = ?", (tournament_id,))
+            return cur.fetchone()
+
+    def get_purged_tournaments(self):
+        with self.connections.reader() as cur:
+            cur.execute("SELECT tournament_id, archived_version FROM tournaments WHERE purged = 1")
+            return cur.fetchall()
+
+    # Complete once every fixture (the Final last) has a result.
+    def is_season_complete(self, tournament_id):
+        with self.connections.reader() as cur:
+            cur.execute("SELECT COUNT(*) AS total, COALESCE(SUM(status != 'Played'), 0) AS pending FROM fixtures WHERE tournament_id = ?", (tournament_id,))
+            r = cur.fetchone()
+        return r['total'] > 0 and r['pending'] == 0
+
+    # Not a content change, so the version is left alone.
+    def set_archived_version(self, tournament_id, version):
+        with self.connections.writer() as cur:
+            cur.execute("UPDATE tournaments SET archived_version = ? WHERE tournament_id = ?", (version, tournament_id))
+
+    # Drops an archived season's rows from the hot tables; its snapshot becomes the only copy. The
+    # all-time tables keep its results, and the version stays put so the snapshot remains current.
+    def purge_tournament_rows(self, tournament_id):
+        with self.connections.writer() as cur:
+            cur.execute("DELETE FROM bracket_slots WHERE tournament_id = ?", (tournament_id,))
+            cur.execute("DELETE FROM fixtures WHERE tournament_id = ?", (tournament_id,))
+            cur.execute("DELETE FROM teams WHERE tournament_id = ?", (tournament_id,))
+            cur.execute("UPDATE tournaments SET purged = 1 WHERE tournament_id = ?", (tournament_id,))
+
+    # --- READ MODELS: rows already in the API's JSON shape, for endpoints that only serialize ---
+    # No Team/Match objects are built; names, goal difference and points come out of SQLite.
+    # With `since`, only rows whose change_seq is newer than a version the client already has.
+    def get_fixture_payload_rows(self, tournament_id, since=None):
+        with self.connections.reader() as cur:
+            cur.execute(f'''SELECT f.match_no, f.stage, f.round_in_stage,
+                                   COALESCE(t1.team_name, f.placeholder_t1) AS team1_name, COALESCE(t2.team_name, f.placeholder_t2) AS team2_name,
+                                   f.team1_goals, f.team2_goals, f.team1_pso, f.team2_pso, f.status
+                            FROM fixtures f LEFT JOIN teams t1 ON t1.team_id = f.team1_id LEFT JOIN teams t2 ON t2.team_id = f.team2_id
+                            WHERE f.tournament_id = ?{' AND f.change_seq > ?' if since is not None else ''} ORDER BY f.match_no''',
+                        (tournament_id,) if since is None else (tournament_id, since))
+            return [dict(r) for r in cur]
+
+# --- VERSIONED CACHE ---
+# Small LRU of values that are only valid for one tournament version; a lookup with any other
+# version misses, so writers never have to invalidate anything.
+class VersionedCache:
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version: return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries: self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock: self._entries.pop(key, None)
+
+# --- STANDINGS ENGINE ---
+# The one place group/league tables are ranked; the API, live events and promotion all read them here.
+# Tables are computed from the played fixtures, not the teams counters, and cached per tournament version.
+# Ranking: points; then, among the teams level on points, head-to-head points, goal difference and
+# goals for (reapplied to any smaller set that is still level); then overall goal difference, goals
+# for and name.
+class StandingsEngine:
+    FIELDS = ('name', 'matches_played', 'wins', 'draws', 'losses', 'goals_for', 'goals_against', 'goal_difference', 'points')
+
+    PLAYED = "tournament_id = ? AND status = 'Played' AND stage_kind IN ('group', 'league')"
+
+    def __init__(self, db_manager, max_entries=32):
+        self.db = db_manager
+        self.cache = VersionedCache(max_entries)
+
+    # {group_name: [row, ...]} in group label order, each group ranked. Rows carry FIELDS plus team_id,
+    # group_name and change_seq. Shared between callers, so treat them as read-only. Tables read inside
+    # a write transaction see uncommitted results and are never cached.
+    def tables(self, tournament_id, version=None):
+        cacheable = not self.db.connections.in_write_transaction()
+        if cacheable:
+            if version is None: version = self.db.get_tournament_version(tournament_id)
+            tables = self.cache.get(tournament_id, version)
+            if tables is not None: return tables
+        tables = self._compute(tournament_id)
+        if cacheable and version is not None: self.cache.put(tournament_id, version, tables)
+        return tables
+
+    # Totals come from one aggregate over the played fixtures; head-to-head records are then fetched
+    # only for pairs of teams level on points, which keeps large groups cheap.
+    def _compute(self, tournament_id):
+        with self.db.connections.reader() as cur:
+            cur.execute("SELECT team_id, team_name, group_name, change_seq FROM teams WHERE tournament_id = ?", (tournament_id,))
+            rows = {r['team_id']: {'team_id': r['team_id'], 'name': r['team_name'], 'group_name': r['group_name'], 'matches_played': 0, 'wins': 0, 'draws': 0,
+                                   'losses': 0, 'goals_for': 0, 'goals_against': 0, 'goal_difference': 0, 'points': 0, 'change_seq': r['change_seq']} for r in cur}
+            cur.execute(f'''SELECT team_id, COUNT(*) AS matches_played, SUM(scored > conceded) AS wins, SUM(scored = conceded) AS draws,
+                                   SUM(scored < conceded) AS losses, SUM(scored) AS goals_for, SUM(conceded) AS goals_against
+                            FROM (SELECT team1_id AS team_id, team1_goals AS scored, team2_goals AS conceded FROM fixtures WHERE {self.PLAYED}
+                                  UNION ALL SELECT team2_id, team2_goals, team1_goals FROM fixtures WHERE {self.PLAYED})
+                            GROUP BY team_id''', (tournament_id, tournament_id))
+            for r in cur:
+                row = rows.get(r['team_id'])
+                if row is None: continue
+                for field in ('matches_played', 'wins', 'draws', 'losses', 'goals_for', 'goals_against'): row[field] = r[field]
+                row['goal_difference'] = row['goals_for'] - row['goals_against']
+                row['points'] = row['wins'] * 3 + row['draws']
+            groups = {}
+            for row in sorted(rows.values(), key=lambda r: -r['points']): groups.setdefault(row['group_name'], []).append(row)
+            levels = {name: self._level(group, lambda r: r['points']) for name, group in groups.items()}
+            tied = [(r['team_id'], r['points']) for group in levels.values() for level in group if len(level) > 1 for r in level]
+            h2h = {team_id: {} for team_id, _ in tied}  # h2h[x][y] = (points, goals_for, goals_against) of x against y
+            if tied:
+                cur.execute(f'''WITH level(team_id, points) AS (VALUES {','.join(['(?, ?)'] * len(tied))})
+                                SELECT team1_id, team2_id, team1_goals, team2_goals
+                                FROM level a CROSS JOIN level b CROSS JOIN fixtures
+                                WHERE b.points = a.points AND b.team_id != a.team_id AND team1_id = a.team_id AND team2_id = b.team_id AND {self.PLAYED}''',
+                            (*[v for pair in tied for v in pair], tournament_id))
+                for team1, team2, goals1, goals2 in cur:
+                    for x, y, scored, conceded in ((team1, team2, goals1, goals2), (team2, team1, goals2, goals1)):
+                        p, gf, ga = h2h[x].get(y, (0, 0, 0))
+                        h2h[x][y] = (p + (3 if scored > conceded else scored == conceded), gf + scored, ga + conceded)
+        ranked = {}
+        for name in sorted(groups, key=lambda g: (len(g), g)):
+            ranked[name] = [r for level in levels[name] for r in (self._break_tie(level, h2h) if len(level) > 1 else level)]
+        return ranked
+
+    # Orders teams level on points by their mini-table among themselves; a smaller set still level
+    # goes through it again, and a set it cannot split falls back to the overall figures.
+    def _break_tie(self, tied, h2h):
+        ids = {r['team_id'] for r in tied}
+        mini = {}
+        for r in tied:
+            points = scored = conceded = 0
+            for opponent, (p, gf, ga) in h2h[r['team_id']].items():
+                if opponent in ids: points, scored, conceded = points + p, scored + gf, conceded + ga
+            mini[r['team_id']] = (-points, conceded - scored, -scored)
+        ranked = []
+        for level in self._level(sorted(tied, key=lambda r: mini[r['team_id']]), lambda r: mini[r['team_id']]):
+            if len(level) == 1: ranked += level
+            elif len(level) < len(tied): ranked += self._break_tie(level, h2h)
+            else: ranked += sorted(level, key=lambda r: (-r['goal_difference'], -r['goals_for'], r['name']))
+        return ranked
 
-    def update_fixture_result(self, match):
-        self.cursor.execute("UPDATE fixtures SET team1_goals = ?, team2_goals = ?, team1_pso = ?, team2_pso = ?, status = 'Played' WHERE match_no = ?",
-                            (match.team1_goals, match.team2_goals, match.team1_pso, match.team2_pso, match.match_no))
-        self.conn.commit()
+    # Splits an already sorted list into runs with equal key(row).
+    def _level(self, rows, key):
+        runs = []
+        for row in rows:
+            if runs and key(runs[-1][0]) == key(row): runs[-1].append(row)
+            else: runs.append([row])
+        return runs
 
-    def update_fixture_teams(self, match_no, t1_id, t2_id):
-        if t1_id: self.cursor.execute("UPDATE fixtures SET team1_id = ?, placeholder_t1 = NULL WHERE match_no = ?", (t1_id, match_no))
-        if t2_id: self.cursor.execute("UPDATE fixtures SET team2_id = ?, placeholder_t2 = NULL WHERE match_no = ?", (t2_id, match_no))
-        self.conn.commit()
 
-# --- TEAM AND MATCH CLASSES (No changes here) ---
+# --- BULK WRITER (used through DatabaseManager.batch) ---
+class BatchWriter:
+    def __init__(self, cursor, db_manager):
+        self.cursor = cursor
+        self.db = db_manager
+
+    def create_tournament(self, season_number, settings_json):
+        date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.cursor.execute("INSERT INTO tournaments (season_number, created_date, settings) VALUES (?, ?, ?)", (season_number, date, settings_json))
+        return self.cursor.lastrowid
+
+    # team_rows: iterable of (team_name, group_name). Duplicate names are skipped (INSERT OR IGNORE).
+    def add_teams(self, tournament_id, team_rows):
+        self.cursor.executemany("INSERT OR IGNORE INTO teams (tournament_id, team_name, group_name) VALUES (?, ?, ?)",
+                                ((tournament_id, name, group) for name, group in team_rows))
+
+    # fixture_rows: iterable of (tournament_id, t1_id, t2_id, p1, p2, stage, round_in_stage), consumed lazily.
+    def add_fixtures(self, fixture_rows):
+        self.cursor.executemany("INSERT INTO fixtures (tournament_id, team1_id, team2_id, placeholder_t1, placeholder_t2, stage, round_in_stage, stage_kind) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                ((*row, classify_stage(row[5])) for row in fixture_rows))
+
+    # result_rows: iterable of (team1_goals, team2_goals, match_no). Team counters are not touched (the
+    # all-time tables are); follow up with DatabaseManager.rebuild_standings inside the same batch.
+    def record_results(self, tournament_id, result_rows):
+        result_rows = list(result_rows)
+        self.cursor.execute('''SELECT f.match_no, f.status, f.team1_goals, f.team2_goals, t1.team_name AS team1_name, t2.team_name AS team2_name
+                               FROM fixtures f JOIN teams t1 ON t1.team_id = f.team1_id JOIN teams t2 ON t2.team_id = f.team2_id
+                               WHERE f.tournament_id = ?''', (tournament_id,))
+        current = {r['match_no']: r for r in self.cursor.fetchall()}
+        version = self.db._bump_version(self.cursor, tournament_id)
+        self.cursor.executemany("UPDATE fixtures SET team1_goals = ?, team2_goals = ?, team1_pso = NULL, team2_pso = NULL, status = 'Played', change_seq = ? WHERE match_no = ?",
+                                ((g1, g2, version, match_no) for g1, g2, match_no in result_rows))
+        self.db._apply_all_time_changes(self.cursor, ((c['team1_name'], c['team2_name'], (c['team1_goals'], c['team2_goals']) if c['status'] == 'Played' else None, (g1, g2))
+                                                      for g1, g2, match_no in result_rows for c in [current.get(match_no)] if c is not None))
+
+    # records: (line_no, record, error) from read_result_records, consumed one at a time. Each record is
+    # checked against its fixture's current teams; the results and the accumulated standings changes are
+    # written with one executemany each at the end. A record for a played fixture corrects its result.
+    # Returns (applied match_nos, [{'line', 'message'}] for the rejected records).
+    def import_results(self, tournament_id, records):
+        cur = self.cursor
+        cur.execute("SELECT team_id, team_name FROM teams WHERE tournament_id = ?", (tournament_id,))
+        team_ids = {r['team_name']: r['team_id'] for r in cur.fetchall()}
+        cur.execute("SELECT match_no, team1_id, team2_id, team1_goals, team2_goals, status, stage_kind FROM fixtures WHERE tournament_id = ? ORDER BY match_no", (tournament_id,))
+        fixtures = {r['match_no']: dict(r) for r in cur.fetchall()}
+        unplayed = {}  # (team1_id, team2_id) -> unplayed match_nos in order, for records without a match_no
+        for f in fixtures.values():
+            if f['status'] != 'Played' and f['team1_id'] is not None and f['team2_id'] is not None:
+                unplayed.setdefault((f['team1_id'], f['team2_id']), deque()).append(f['match_no'])
+        team_names = {team_id: name for name, team_id in team_ids.items()}
+        results, deltas, errors, all_time, head_to_head = {}, {}, [], {}, {}
+        for line_no, record, error in records:
+            if error is None:
+                try: match_no, result = self._check_result_record(record, fixtures, team_ids, unplayed)
+                except ValueError as e: error = str(e)
+            if error is not None:
+                errors.append({'line': line_no, 'message': error})
+                continue
+            fixture = fixtures[match_no]
+            pair = (fixture['team1_id'], fixture['team2_id'])
+            old_result = (fixture['team1_goals'], fixture['team2_goals']) if fixture['status'] == 'Played' else None
+            if fixture['stage_kind'] != 'knockout': self.db._add_result_delta(deltas, *pair, old_result, result[:2])
+            self.db._add_all_time_change(all_time, head_to_head, team_names[pair[0]], team_names[pair[1]], old_result, result[:2])
+            if old_result is None and match_no in unplayed.get(pair, ()): unplayed[pair].remove(match_no)
+            fixture.update(team1_goals=result[0], team2_goals=result[1], status='Played')
+            results[match_no] = result
+        if results:
+            version = self.db._bump_version(cur, tournament_id)
+            cur.executemany("UPDATE fixtures SET team1_goals = ?, team2_goals = ?, team1_pso = ?, team2_pso = ?, status = 'Played', change_seq = ? WHERE match_no = ?",
+                            [(*result, version, match_no) for match_no, result in results.items()])
+            self.db._write_team_deltas(cur, deltas, version)
+            self.db._write_all_time(cur, all_time, head_to_head)
+        return list(results), errors
+
+    def _check_result_record(self, record, fixtures, team_ids, unplayed):
+        if not isinstance(record, dict): raise ValueError("expected an object with the result fields")
+        names = [str(record.get(key) or "").strip().upper() for key in ('team1', 'team2')]
+        for key, name in zip(('team1', 'team2'), names):
+            if not name: raise ValueError(f"missing {key}")
+            if name not in team_ids: raise ValueError(f"unknown team '{name}'")
+        pair = (team_ids[names[0]], team_ids[names[1]])
+        match_no = parse_score(record, 'match_no', required=False)
+        if match_no is not None:
+            if match_no not in fixtures: raise ValueError(f"match {match_no} is not part of this tournament")
+        elif unplayed.get(pair):
+            match_no = unplayed[pair][0]
+        else:
+            raise ValueError(f"no unplayed fixture {names[0]} vs {names[1]}")
+        fixture = fixtures[match_no]
+        if fixture['team1_id'] is None or fixture['team2_id'] is None: raise ValueError(f"match {match_no} does not have both teams yet")
+        if (fixture['team1_id'], fixture['team2_id']) != pair:
+            current = {team_id: name for name, team_id in team_ids.items()}
+            raise ValueError(f"match {match_no} is {current.get(fixture['team1_id'])} vs {current.get(fixture['team2_id'])}, not {names[0]} vs {names[1]}")
+        g1, g2 = parse_score(record, 'team1_goals'), parse_score(record, 'team2_goals')
+        p1, p2 = parse_score(record, 'team1_pso', required=False), parse_score(record, 'team2_pso', required=False)
+        if (p1 is None) != (p2 is None): raise ValueError("give both penalty scores or neither")
+        if p1 is not None and p1 == p2: raise ValueError("a penalty shoot-out needs a winner")
+        if fixture['stage_kind'] == 'knockout' and g1 == g2 and p1 is None: raise ValueError(f"match {match_no} is a knockout draw and needs penalty scores")
+        return match_no, (g1, g2, p1, p2)
+
+# --- TEAM AND MATCH CLASSES ---
+# Slotted and detached from the database: writes go through DatabaseManager (record_result).
 class Team:
+    __slots__ = ('team_id', 'tournament_id', 'name', 'group_name', 'matches_played', 'wins', 'draws', 'losses', 'goals_for', 'goals_against')
+
     def __init__(self, **kwargs):
         self.team_id = kwargs.get('team_id')
         self.tournament_id = kwargs.get('tournament_id')
@@ -186,8 +1084,10 @@ class Team:
     def points(self): return (self.wins * 3) + self.draws
 
 class Match:
-    def __init__(self, db_manager, team1=None, team2=None, **kwargs):
-        self.db = db_manager
+    __slots__ = ('match_no', 'tournament_id', 'team1', 'team2', 'p1', 'p2', 'team1_goals', 'team2_goals',
+                 'team1_pso', 'team2_pso', 'status', 'stage', 'stage_kind', 'round_in_stage')
+
+    def __init__(self, team1=None, team2=None, **kwargs):
         self.match_no = kwargs.get('match_no')
         self.tournament_id = kwargs.get('tournament_id')
         self.team1 = team1
@@ -200,6 +1100,7 @@ class Match:
         self.team2_pso = kwargs.get('team2_pso')
         self.status = kwargs.get('status', 'Not Played')
         self.stage = kwargs.get('stage')
+        self.stage_kind = kwargs.get('stage_kind') or classify_stage(self.stage)
         self.round_in_stage = kwargs.get('round_in_stage')
 
     @property
@@ -208,162 +1109,273 @@ class Match:
     @property
     def team2_name(self): return self.team2.name if self.team2 else self.p2
 
-    def update_stats(self, new_t1_goals, new_t2_goals, pso_t1=None, pso_t2=None):
+    @property
+    def is_initial_stage(self): return self.stage_kind != 'knockout'
+
+    # Returns the previous (team1_goals, team2_goals), or None if the match had not been played.
+    def set_result(self, new_t1_goals, new_t2_goals, pso_t1=None, pso_t2=None):
+        old_result = (self.team1_goals, self.team2_goals) if self.status == 'Played' else None
         self.team1_goals, self.team2_goals, self.team1_pso, self.team2_pso = new_t1_goals, new_t2_goals, pso_t1, pso_t2
         self.status = 'Played'
-        self.db.update_fixture_result(self)
-        is_initial_stage = "Group" in self.stage or "League" in self.stage
-        if self.team1 and self.team2 and is_initial_stage:
-            self.db.recalculate_team_stats(self.team1.team_id)
-            self.db.recalculate_team_stats(self.team2.team_id)
+        return old_result
+
+# --- PDF REPORT ---
+# Renders the /api/tournaments/<id> payload (standings + fixtures) to a PDF at `path`.
+# The file is written next to its destination first and moved into place, so readers never see a partial report.
+# reportlab is imported here so that only the report worker pays for loading it.
+def build_pdf_report(payload, path):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.units import inch
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('ReportTitle', parent=styles['Title'], alignment=TA_CENTER)
+    header_style = [('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#334155')), ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'), ('FONTSIZE', (0, 0), (-1, -1), 8),
+                    ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#cbd5e1')), ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')]
+    qualifiers = payload['settings'].get('qualifiers_per_group', 0)
+    story = [Paragraph("THE RENDERED RIVALRY CUP", title_style), Paragraph(f"Season {payload['season_number']} Report", styles['Heading2']), Spacer(1, 0.2 * inch)]
+
+    story.append(Paragraph("Standings", styles['Heading2']))
+    for group_name, teams in payload['standings'].items():
+        story.append(Paragraph(f"Group {group_name}", styles['Heading4']))
+        rows = [['#', 'Team', 'MP', 'W', 'D', 'L', 'GF', 'GA', 'GD', 'Pts']]
+        rows += [[i + 1, t['name'], t['matches_played'], t['wins'], t['draws'], t['losses'], t['goals_for'], t['goals_against'], t['goal_difference'], t['points']] for i, t in enumerate(teams)]
+        table = Table(rows, colWidths=[0.3 * inch, 2.2 * inch] + [0.5 * inch] * 8, repeatRows=1)
+        style = list(header_style) + [('ALIGN', (2, 0), (-1, -1), 'CENTER')]
+        if qualifiers: style.append(('BACKGROUND', (0, 1), (-1, min(qualifiers, len(teams))), colors.HexColor('#f0fdf4')))
+        table.setStyle(TableStyle(style))
+        story += [table, Spacer(1, 0.15 * inch)]
+
+    story += [PageBreak(), Paragraph("Fixtures & Results", styles['Heading2'])]
+    rows = [['No', 'Stage', 'Team 1', 'Score', 'Team 2']]
+    for m in payload['fixtures']:
+        score = f"{m['team1_goals']} - {m['team2_goals']}" if m['status'] == 'Played' else 'vs'
+        if m['status'] == 'Played' and m['team1_pso'] is not None: score += f" ({m['team1_pso']} - {m['team2_pso']} p)"
+        rows.append([m['display_no'], m['stage'] if m['stage'] == 'Final' or classify_stage(m['stage']) != 'knockout' else f"{m['stage']} {m['round_in_stage']}", m['team1_name'] or 'TBD', score, m['team2_name'] or 'TBD'])
+    table = Table(rows, colWidths=[0.4 * inch, 1.4 * inch, 2.0 * inch, 1.2 * inch, 2.0 * inch], repeatRows=1)
+    table.setStyle(TableStyle(list(header_style) + [('ALIGN', (3, 0), (3, -1), 'CENTER'), ('ALIGN', (2, 1), (2, -1), 'RIGHT')]))
+    story.append(table)
+
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    SimpleDocTemplate(tmp_path, pagesize=A4, title=f"Season {payload['season_number']} Report").build(story)
+    os.replace(tmp_path, path)
 
 # --- TOURNAMENT APP CLASS (Major changes here) ---
 class TournamentApp:
     def __init__(self, db_manager):
         self.db = db_manager
+        self.on_season_complete = None  # optional callback(tournament_id), fired once every fixture is played
 
     # <<< NEW: This function only handles the group/league stage now >>>
+    # Yields fixture rows lazily in schedule order (leg, round, match slot, group); feed them to
+    # BatchWriter.add_fixtures, whose executemany consumes them as they come. Pairings come from
+    # round_robin_round, so only one round per group is held at a time.
     def generate_group_stage_fixtures(self, tournament_id, settings, teams_by_group):
-        is_league_mode = settings['is_league_mode']
-        num_legs = settings['num_legs']
-        group_names = sorted(teams_by_group.keys())
-        schedules_by_group, max_rounds, matches_per_round = {}, 0, 0
-        
-        for name, teams_in_group in teams_by_group.items():
-            if len(teams_in_group) < 2: continue
-            if len(teams_in_group) // 2 > matches_per_round: matches_per_round = len(teams_in_group) // 2
-            random.shuffle(teams_in_group)
-            if len(teams_in_group) % 2 != 0: teams_in_group.append(None)
-            num_rounds_in_group = len(teams_in_group) - 1
-            if num_rounds_in_group > max_rounds: max_rounds = num_rounds_in_group
-            rounds = [[] for _ in range(num_rounds_in_group)]
-            for i in range(num_rounds_in_group):
-                for j in range(len(teams_in_group) // 2):
-                    t1_id, t2_id = teams_in_group[j], teams_in_group[len(teams_in_group) - 1 - j]
-                    if t1_id and t2_id: rounds[i].append((t1_id, t2_id))
-                teams_in_group.insert(1, teams_in_group.pop())
-            schedules_by_group[name] = rounds
-            
-        for leg in range(num_legs):
-            for round_idx in range(max_rounds):
-                for match_idx in range(matches_per_round):
-                    for name in group_names:
-                        if name in schedules_by_group and round_idx < len(schedules_by_group[name]) and match_idx < len(schedules_by_group[name][round_idx]):
-                            team1_id, team2_id = schedules_by_group[name][round_idx][match_idx]
-                            t1, t2 = (team2_id, team1_id) if leg % 2 == 1 else (team1_id, team2_id)
-                            stage_name = "League" if is_league_mode else f"Group {name}"
-                            self.db.add_fixture(tournament_id, t1, t2, None, None, stage_name, round_idx + 1)
-    
+        groups = {}
+        for name, team_ids in teams_by_group.items():
+            if len(team_ids) < 2: continue
+            random.shuffle(team_ids)
+            groups[name] = team_ids
+        group_names = sorted(groups, key=lambda g: (len(g), g))
+        stage_names = {name: "League" if settings['is_league_mode'] else f"Group {name}" for name in group_names}
+        num_rounds = {name: len(groups[name]) + len(groups[name]) % 2 - 1 for name in group_names}
+        for leg in range(settings['num_legs']):
+            for round_idx in range(max(num_rounds.values(), default=0)):
+                pairings = [(name, round_robin_round(len(groups[name]), round_idx)) for name in group_names if round_idx < num_rounds[name]]
+                for match_idx in range(max(len(pairs) for _, pairs in pairings)):
+                    for name, pairs in pairings:
+                        if match_idx >= len(pairs): continue
+                        team1_id, team2_id = groups[name][pairs[match_idx][0]], groups[name][pairs[match_idx][1]]
+                        if leg % 2 == 1: team1_id, team2_id = team2_id, team1_id
+                        yield (tournament_id, team1_id, team2_id, None, None, stage_names[name], round_idx + 1)
+
+    # Default first rounds of the original formats (a league or 2/4 groups into a 4 or 8 team bracket),
+    # as indexes into qualifier_placeholders; every other format is seeded by bracket_order.
+    LEGACY_PAIRINGS = {(1, 8): [(0, 7), (3, 4), (2, 5), (1, 6)], (2, 8): [(0, 7), (2, 5), (4, 3), (6, 1)], (4, 8): [(0, 3), (4, 7), (2, 1), (6, 5)],
+                       (1, 4): [(0, 3), (1, 2)], (2, 4): [(0, 3), (2, 1)], (4, 4): [(0, 1), (2, 3)]}
+
+    # Group by group: A1, A2, ..., B1, ... (or 1st Place, 2nd Place, ... for a league).
+    def qualifier_placeholders(self, settings):
+        if settings['is_league_mode']: return [to_ordinal(i) for i in range(1, settings['qualifiers_per_group'] + 1)]
+        return [f"{g}{i}" for g in group_labels(settings['num_groups']) for i in range(1, settings['qualifiers_per_group'] + 1)]
+
+    def default_first_round(self, settings):
+        size, num_groups = knockout_size(settings['knockout_mode']), settings['num_groups']
+        placeholders = self.qualifier_placeholders(settings)
+        legacy = self.LEGACY_PAIRINGS.get((num_groups, size))
+        if legacy: return [(placeholders[a], placeholders[b]) for a, b in legacy]
+        if size == 2: return [(placeholders[0], placeholders[1])]
+        # Seeds rank by rank across the groups (every group winner, then every runner-up, ...), so
+        # first-round opponents always come from different groups.
+        per_group = settings['qualifiers_per_group']
+        seeds = [placeholders[g * per_group + r] for r in range(per_group) for g in range(num_groups)]
+        order = bracket_order(size)
+        return [(seeds[order[i]], seeds[order[i + 1]]) for i in range(0, size, 2)]
+
     # <<< NEW: This function handles all knockout logic and accepts custom formats >>>
+    # Yields placeholder fixture rows like generate_group_stage_fixtures: the first round from the
+    # qualifiers, then each round from the winners of consecutive pairs of the one before, down to the Final.
     def generate_knockout_fixtures(self, tournament_id, settings, custom_qf_pairings=None, custom_sf_pairings=None):
-        knockout_mode = settings['knockout_mode']
-        is_league_mode = settings['is_league_mode']
-        num_groups = settings['num_groups']
-        qualifiers_per_group = settings['qualifiers_per_group']
-        group_names = ['A', 'B', 'C', 'D'][:num_groups]
-        placeholders = []
-        for g_name in group_names:
-            for i in range(1, qualifiers_per_group + 1):
-                placeholders.append(to_ordinal(i) if is_league_mode else f"{g_name}{i}")
-        if knockout_mode == '3':
-            qf_pairings = []
-            if custom_qf_pairings: qf_pairings = custom_qf_pairings
-            else:
-                if is_league_mode: default = [(0, 7), (3, 4), (2, 5), (1, 6)]
-                elif num_groups == 2: default = [(0, 7), (2, 5), (4, 3), (6, 1)]
-                else: default = [(0, 3), (4, 7), (2, 1), (6, 5)]
-                qf_pairings = [(placeholders[p[0]], placeholders[p[1]]) for p in default]
-            for i, (p1, p2) in enumerate(qf_pairings): self.db.add_fixture(tournament_id, None, None, p1, p2, "Quarter-Final", i + 1)
-        if knockout_mode in ['2', '3']:
-            sf_pairings = []
-            if custom_sf_pairings: sf_pairings = custom_sf_pairings
-            else:
-                if knockout_mode == '2':
-                    if is_league_mode: default = [(0, 3), (1, 2)]
-                    elif num_groups == 2: default = [(0, 3), (2, 1)]
-                    else: default = [(0, 1), (2, 3)]
-                    sf_pairings = [(placeholders[p[0]], placeholders[p[1]]) for p in default]
-                else:
-                    sf_pairings = [("Winner Quarter-Final 1", "Winner Quarter-Final 2"), ("Winner Quarter-Final 3", "Winner Quarter-Final 4")]
-            for i, (p1, p2) in enumerate(sf_pairings): self.db.add_fixture(tournament_id, None, None, p1, p2, "Semi-Final", i + 1)
-        if knockout_mode in ['1', '2', '3']:
-            if knockout_mode == '1':
-                final_pairings = [(placeholders[0], placeholders[1])]
-            else:
-                # <<< FIX IS HERE: Use the full stage name "Semi-Final" >>>
-                final_pairings = [("Winner Semi-Final 1", "Winner Semi-Final 2")]
-            for i, (p1, p2) in enumerate(final_pairings): self.db.add_fixture(tournament_id, None, None, p1, p2, "Final", i + 1)
+        teams = knockout_size(settings['knockout_mode'])
+        if teams < 2: return
+        custom = {"Quarter-Final": custom_qf_pairings, "Semi-Final": custom_sf_pairings}
+        pairings = self.default_first_round(settings)
+        while teams >= 2:
+            stage = knockout_stage_name(teams)
+            if custom.get(stage): pairings = custom[stage]
+            for i, (p1, p2) in enumerate(pairings): yield (tournament_id, None, None, p1, p2, stage, i + 1)
+            pairings = [(f"Winner {stage} {i + 1}", f"Winner {stage} {i + 2}") for i in range(0, len(pairings) - 1, 2)]
+            teams //= 2
 
-    
+    # Parses the knockout placeholders once and persists them as the tournament's bracket graph.
+    def build_bracket_graph(self, tournament_id):
+        knockout_fixtures = [f for f in self.db.get_all_fixtures(tournament_id, team_map={}) if not f.is_initial_stage]
+        match_by_stage_round = {(f.stage, f.round_in_stage): f.match_no for f in knockout_fixtures}
+        slots = []
+        for fixture in knockout_fixtures:
+            for side, placeholder in ((1, fixture.p1), (2, fixture.p2)):
+                source = parse_placeholder(placeholder)
+                if source is None: continue
+                kind, key, number = source
+                if kind == 'rank': slots.append((fixture.match_no, side, placeholder, key, number, None))
+                elif (key, number) in match_by_stage_round: slots.append((fixture.match_no, side, placeholder, None, None, match_by_stage_round[(key, number)]))
+        self.db.save_bracket_slots(tournament_id, slots)
+        return len(slots)
 
-    # (check_and_promote and other methods remain unchanged)
-    def check_and_promote(self, tournament_id):
-        # This function doesn't need changes as it relies on placeholders which are now set either by default or custom logic
-        all_fixtures = self.db.get_all_fixtures(tournament_id)
-        tournament_info = self.db.get_tournament_by_id(tournament_id)
-        settings = json.loads(tournament_info['settings'])
-        is_league_mode = settings['is_league_mode']
-        qualifiers_per_group = settings['qualifiers_per_group']
-        initial_stage_fixtures = [f for f in all_fixtures if "Group" in f.stage or "League" in f.stage]
-        if not initial_stage_fixtures: return False
-        initial_stage_complete = all(f.status == 'Played' for f in initial_stage_fixtures)
-        first_knockout_fixture = next((f for f in all_fixtures if f.stage in ["Quarter-Final", "Semi-Final", "Final"]), None)
-        if first_knockout_fixture and initial_stage_complete:
-            knockouts_started = first_knockout_fixture.team1 is not None or first_knockout_fixture.team2 is not None
-            if not knockouts_started:
-                self._promote_group_winners(tournament_id, all_fixtures, is_league_mode, qualifiers_per_group)
-                return True
-        knockout_stages = ["Quarter-Final", "Semi-Final"]
-        for stage in knockout_stages:
-            stage_fixtures = [f for f in all_fixtures if f.stage == stage]
-            if not stage_fixtures or not all(f.status == 'Played' for f in stage_fixtures): continue
-            next_stage_name = self._get_next_stage(stage)
-            if not next_stage_name: continue
-            next_stage_fixture = next((f for f in all_fixtures if f.stage == next_stage_name), None)
-            if next_stage_fixture and next_stage_fixture.team1 is None:
-                self._promote_knockout_winners(all_fixtures, stage)
-                return True
-        return False
-
-    def _promote_group_winners(self, tournament_id, all_fixtures, is_league_mode, qualifiers_per_group):
-        all_teams = self.db.get_all_teams(tournament_id)
-        group_names = sorted(list(set(team.group_name for team in all_teams)))
-        knockout_fixtures = [f for f in all_fixtures if "Group" not in f.stage and "League" not in f.stage]
-        
-        # This needs to handle 'Top Seed #X' for league mode
-        for group in group_names:
-            teams_in_group = [t for t in all_teams if t.group_name == group]
-            standings = sorted(teams_in_group, key=lambda t: (t.points, t.goal_difference, t.goals_for, -t.goals_against), reverse=True)
-            for i in range(len(standings)):
-                rank, team_to_promote = i + 1, standings[i]
-                placeholder = to_ordinal(rank) if is_league_mode else f"{group}{rank}"
-                for fixture in knockout_fixtures:
-                    if fixture.p1 == placeholder: self.db.update_fixture_teams(fixture.match_no, t1_id=team_to_promote.team_id, t2_id=None)
-                    if fixture.p2 == placeholder: self.db.update_fixture_teams(fixture.match_no, t1_id=None, t2_id=team_to_promote.team_id)
-
-    def _promote_knockout_winners(self, all_fixtures, completed_stage):
-        completed_fixtures = [f for f in all_fixtures if f.stage == completed_stage]
-        next_stage_name = self._get_next_stage(completed_stage)
-        next_stage_fixtures = [f for f in all_fixtures if f.stage == next_stage_name]
-        for match in completed_fixtures:
-            winner = match.team1 if (match.team1_pso is not None and match.team1_pso > match.team2_pso) or \
-                                   (match.team1_pso is None and match.team1_goals > match.team2_goals) else match.team2
-            placeholder = f"Winner {match.stage} {match.round_in_stage}"
-            for next_fixture in next_stage_fixtures:
-                if next_fixture.p1 == placeholder: self.db.update_fixture_teams(next_fixture.match_no, t1_id=winner.team_id, t2_id=None)
-                if next_fixture.p2 == placeholder: self.db.update_fixture_teams(next_fixture.match_no, t1_id=None, t2_id=winner.team_id)
-    
-    def _get_next_stage(self, current_stage):
-        return {"Quarter-Final": "Semi-Final", "Semi-Final": "Final"}.get(current_stage)
-
-    def autogenerate_group_results(self, tournament_id):
-        all_fixtures = self.db.get_all_fixtures(tournament_id)
-        fixtures_to_play = [f for f in all_fixtures if ("Group" in f.stage or "League" in f.stage) and f.status == 'Not Played' and f.team1 and f.team2]
-        if not fixtures_to_play:
-            return 0
-        for match in fixtures_to_play:
-            score1 = random.randint(0, 5)
-            score2 = random.randint(0, 5)
-            match.update_stats(score1, score2)
-        self.check_and_promote(tournament_id)
-        return len(fixtures_to_play)
\ No newline at end of file
+    # Resolves the open bracket slots whose source is complete and fills them in one batched update.
+    # Pass match_no to only resolve what that fixture feeds: a knockout result fills the winner slots it
+    # feeds and leaves the rank slots alone. Rank slots are resolved once the group stage is complete and
+    # are frozen as soon as one knockout fixture seeded from them has been played, so a later group
+    # correction cannot put a team into the bracket twice. Returns the (match_no, side, team_id) fills applied.
+    def check_and_promote(self, tournament_id, match_no=None):
+        if not self.db.is_bracket_built(tournament_id):
+            # Tournaments created before the graph existed get it built here (once), then resolved in full.
+            self.build_bracket_graph(tournament_id)
+            match_no = None
+        source = self.db.get_fixture_rows([match_no]).get(match_no) if match_no is not None else None
+        slots = self.db.get_open_bracket_slots(tournament_id)
+        fills = []
+        rank_slots = [s for s in slots if s['source_rank'] is not None] if source is None or source['stage_kind'] != 'knockout' else []
+        if rank_slots:
+            total, pending = self.db.get_initial_stage_progress(tournament_id)
+            if total and pending == 0 and not self.db.has_played_rank_slot(tournament_id):
+                tables = self.db.standings.tables(tournament_id)
+                for slot in rank_slots:
+                    table = tables.get(slot['source_group']) if slot['source_group'] else next(iter(tables.values()), [])
+                    if table and slot['source_rank'] <= len(table): fills.append((slot, table[slot['source_rank'] - 1]['team_id']))
+        winner_slots = [s for s in slots if s['source_match_no'] is not None and (match_no is None or s['source_match_no'] == match_no)]
+        sources = {match_no: source} if source is not None else self.db.get_fixture_rows({s['source_match_no'] for s in winner_slots})
+        for slot in winner_slots:
+            winner_id = self._winner_id(sources[slot['source_match_no']])
+            if winner_id is not None: fills.append((slot, winner_id))
+        fills = [(slot['match_no'], slot['side'], team_id) for slot, team_id in fills if slot['current_team_id'] != team_id]
+        self.db.fill_bracket_slots(tournament_id, fills)
+        if self.on_season_complete and self.db.is_season_complete(tournament_id): self.on_season_complete(tournament_id)
+        return fills
+
+    # One result entry and the promotion it triggers, in one transaction. The fixture is re-read inside
+    # it, so two entries for the same match each apply their delta against the stored result.
+    # Returns (match, fills).
+    def enter_result(self, match_no, team1_goals, team2_goals, pso_t1=None, pso_t2=None):
+        with self.db.connections.writer():
+            match = self.db.get_fixture_by_id(match_no)
+            if not match or not match.team1 or not match.team2: raise ValueError(f"Match {match_no} has no two teams to record a result for.")
+            self.db.record_result(match, team1_goals, team2_goals, pso_t1, pso_t2)
+            return match, self.check_and_promote(match.tournament_id, match.match_no)
+
+    # Bulk entry: every record in one transaction, then a single promotion pass.
+    # Returns (applied match_nos, errors, fills); see BatchWriter.import_results.
+    def import_results(self, tournament_id, records):
+        with self.db.batch() as batch:
+            applied, errors = batch.import_results(tournament_id, records)
+            fills = self.check_and_promote(tournament_id) if applied else []
+        return applied, errors, fills
+
+    def _winner_id(self, row):
+        if row['status'] != 'Played' or row['team1_id'] is None or row['team2_id'] is None: return None
+        team1_wins = (row['team1_pso'] is not None and row['team1_pso'] > row['team2_pso']) or \
+                     (row['team1_pso'] is None and row['team1_goals'] > row['team2_goals'])
+        return row['team1_id'] if team1_wins else row['team2_id']
+
+    # Simulates every pending group/league fixture in one transaction: scores are drawn up front,
+    # written with one executemany, standings are rebuilt once and promotion runs once.
+    def autogenerate_group_results(self, tournament_id, seed=None):
+        rng = random.Random(seed)
+        with self.db.batch() as batch:
+            fixtures_to_play = self.db.get_pending_initial_fixtures(tournament_id)
+            if not fixtures_to_play:
+                return 0
+            batch.record_results(tournament_id, [(rng.randint(0, 5), rng.randint(0, 5), f['match_no']) for f in fixtures_to_play])
+            self.db.rebuild_standings(tournament_id)
+            self.check_and_promote(tournament_id)
+        return len(fixtures_to_play)
+
+
+# --- QUERY PLAN CHECK ---
+# Plays a small season through the real code paths on a scratch database, capturing every statement
+# with the connection trace hook, then runs EXPLAIN QUERY PLAN on each distinct one.
+# Returns (sql, plan details, full scans) per statement; any full scan outside FULL_SCAN_ALLOWED is a regression.
+FULL_SCAN_ALLOWED = ("FROM tournaments ORDER BY season_number",  # the season list reads every tournament by design
+                     "FROM all_time_standings ORDER BY",  # walks the rank index for LIMIT rows
+                     "FROM tournaments WHERE purged",  # only the all-time rebuild lists purged seasons
+                     "FROM level a CROSS JOIN level b")  # the standings engine's list of teams level on points
+
+def check_query_plans():
+    statements = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "query_plans.db")
+        db = DatabaseManager(path, trace=statements.append)
+        db.create_tables()
+        statements.clear()  # the migrations' one-off backfills are not hot queries
+        app = TournamentApp(db)
+        settings = {"num_groups": 2, "num_teams_per_group": 4, "is_league_mode": False, "knockout_mode": '2', "qualifiers_per_group": 2, "num_legs": 1}
+        with db.batch() as batch:
+            tournament_id = batch.create_tournament(1, json.dumps(settings))
+            batch.add_teams(tournament_id, ((f"{g}{i}", g) for g in "AB" for i in range(4)))
+            teams_by_group = {"A": [], "B": []}
+            for team in db.get_all_teams(tournament_id): teams_by_group[team.group_name].append(team.team_id)
+            batch.add_fixtures(app.generate_group_stage_fixtures(tournament_id, settings, teams_by_group))
+            batch.add_fixtures(app.generate_knockout_fixtures(tournament_id, settings))
+            app.build_bracket_graph(tournament_id)
+        first = db.get_all_fixtures(tournament_id)[0]
+        db.record_result(first, 2, 1)
+        app.check_and_promote(tournament_id, first.match_no)
+        app.import_results(tournament_id, [(1, {'match_no': first.match_no, 'team1': first.team1_name, 'team2': first.team2_name, 'team1_goals': 1, 'team2_goals': 1}, None)])
+        db.standings.tables(tournament_id)  # teams still level on points: includes the head-to-head query
+        app.autogenerate_group_results(tournament_id, seed=1)
+        semi = db.get_fixture_by_id(next(f.match_no for f in db.get_all_fixtures(tournament_id) if not f.is_initial_stage))
+        db.record_result(semi, 1, 0)
+        app.check_and_promote(tournament_id, semi.match_no)
+        db.rebuild_standings(tournament_id)
+        db.get_team_by_id(first.team1.team_id)
+        for since in (None, 1): db.get_fixture_payload_rows(tournament_id, since)
+        db.standings.tables(tournament_id)
+        db.get_all_time_standings(10)
+        db.get_head_to_head("A0", "B1")
+        db.get_all_time_team("A0")
+        db.get_team_history("A0")
+        db.get_tournament_version(tournament_id)
+        db.get_tournament_by_id(tournament_id)
+        db.get_all_tournaments()
+        db.is_season_complete(tournament_id)
+        db.set_archived_version(tournament_id, db.get_tournament_state(tournament_id)['version'])
+        db.purge_tournament_rows(tournament_id)
+        db.get_purged_tournaments()
+        db.delete_tournament(tournament_id)
+        db.connections.close()
+
+        conn = sqlite3.connect(path)
+        results, seen = [], set()
+        for sql in statements:
+            shape = re.sub(r"'[^']*'|-?\b\d+\b", "?", " ".join(sql.split()))
+            if shape in seen or not shape.upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")): continue
+            seen.add(shape)
+            details = [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+            scans = [d for d in details if re.match(r"SCAN (?!CONSTANT|\(|subquery|[\w_]*_subquery)", d)]
+            if any(allowed in shape for allowed in FULL_SCAN_ALLOWED): scans = []
+            results.append((shape, details, scans))
+        conn.close()
+    return results
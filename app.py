@@ -1,105 +1,670 @@
 # app.py (Full Code, Updated for Custom Brackets)
 import os
+import io
 import json
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session
-from Tournament_Manager import DatabaseManager, TournamentApp, DB_NAME
+import glob
+import gzip
+import shutil
+import tempfile
+import importlib.util
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, jsonify, session, send_file, stream_with_context, g
+from werkzeug.local import LocalProxy
+import click
+from Tournament_Manager import (DatabaseManager, TournamentApp, QueryProfiler, DB_NAME, build_pdf_report, check_query_plans, read_result_records,
+                                result_file_format, group_labels, knockout_size, VersionedCache, StandingsEngine)
 
 # --- Setup ---
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'a-super-secret-key-that-you-should-change')
+# Routes live on a blueprint and each app's state on the TournamentServices built by create_app()
+# (see the end of this file). Importing this module opens no database and loads neither numpy nor
+# reportlab; the names below resolve to the current app's services at request time.
+bp = Blueprint('therrc', __name__, cli_group=None)
 
-db_manager = DatabaseManager(DB_NAME)
-tournament_app = TournamentApp(db_manager)
+def services():
+    return current_app.extensions['therrc']
 
-ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'password123')
+db_manager = LocalProxy(lambda: services().db_manager)
+tournament_app = LocalProxy(lambda: services().tournament_app)
+payload_cache = LocalProxy(lambda: services().payload_cache)
+simulation_cache = LocalProxy(lambda: services().simulation_cache)
+broadcaster = LocalProxy(lambda: services().broadcaster)
 
-# --- Page Routes (No changes here) ---
-@app.route('/')
+# --- Live Event Broadcaster ---
+# One channel per tournament: a short ring buffer of (id, event, data) for Last-Event-ID resume and a
+# condition that idle subscribers sleep on. Events only reach subscribers of this process; the stream
+# route covers other workers by re-checking the stored version on every heartbeat.
+class EventChannel:
+    def __init__(self, history):
+        self.cond = threading.Condition()
+        self.events = deque(maxlen=history)
+        self.seq = 0
+        self.listeners = 0
+
+class EventBroadcaster:
+    def __init__(self, history=256, heartbeat=15):
+        self.history = history
+        self.heartbeat = heartbeat
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def _channel(self, tournament_id):
+        with self._lock:
+            if tournament_id not in self._channels: self._channels[tournament_id] = EventChannel(self.history)
+            return self._channels[tournament_id]
+
+    def has_listeners(self, tournament_id):
+        channel = self._channels.get(tournament_id)
+        return channel is not None and channel.listeners > 0
+
+    def publish(self, tournament_id, event, data):
+        channel = self._channel(tournament_id)
+        with channel.cond:
+            channel.seq += 1
+            channel.events.append((channel.seq, event, data))
+            channel.cond.notify_all()
+
+    # Yields (events, missed) after each wake-up; an empty list means the heartbeat expired.
+    # missed is True when the ring buffer no longer reaches back to the subscriber's last id.
+    def listen(self, tournament_id, last_id=None):
+        channel = self._channel(tournament_id)
+        with channel.cond:
+            cursor = channel.seq if last_id is None or last_id > channel.seq else last_id
+            channel.listeners += 1
+        try:
+            while True:
+                with channel.cond:
+                    if channel.seq == cursor: channel.cond.wait(self.heartbeat)
+                    events = [e for e in channel.events if e[0] > cursor]
+                    missed = bool(events) and events[0][0] > cursor + 1
+                if events: cursor = events[-1][0]
+                yield events, missed
+        finally:
+            with channel.cond: channel.listeners -= 1
+
+def sse_message(event, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def fixture_result(match):
+    return {'match_no': match.match_no, 'team1_goals': match.team1_goals, 'team2_goals': match.team2_goals,
+            'team1_pso': match.team1_pso, 'team2_pso': match.team2_pso, 'status': match.status}
+
+# Pushes the small events for one entered result: the fixture itself, the changed standings rows
+# (with their group's new order) and any bracket slots the result filled.
+def publish_result(match, fills):
+    tournament_id = match.tournament_id
+    if not broadcaster.has_listeners(tournament_id): return
+    version = db_manager.get_tournament_version(tournament_id)
+    broadcaster.publish(tournament_id, 'fixtures', {'version': version, 'fixtures': [fixture_result(match)]})
+    if match.is_initial_stage and match.team1 and match.team2:
+        groups = {}
+        for group_name, table in db_manager.standings.tables(tournament_id, version).items():
+            for row in table:
+                if row['team_id'] not in (match.team1.team_id, match.team2.team_id): continue
+                group = groups.setdefault(group_name, {'order': [r['name'] for r in table], 'rows': []})
+                group['rows'].append(standings_payload_row(row))
+        broadcaster.publish(tournament_id, 'standings', {'version': version, 'groups': groups})
+    if fills:
+        team_map = db_manager.get_team_map(tournament_id)
+        slots = [{'match_no': m, 'side': side, 'team_name': team_map[team_id].name if team_id in team_map else None} for m, side, team_id in fills]
+        broadcaster.publish(tournament_id, 'bracket', {'version': version, 'slots': slots})
+
+# Bulk changes (autogenerate, repairs, deletion) tell subscribers to reload the payload once.
+def publish_refresh(tournament_id):
+    if broadcaster.has_listeners(tournament_id):
+        broadcaster.publish(tournament_id, 'refresh', {'version': db_manager.get_tournament_version(tournament_id)})
+
+# --- Instrumentation (opt-in) ---
+# INSTRUMENTATION=1 wraps every cursor in a timing proxy, adds a Server-Timing header (sql, the request's
+# slowest statements, named spans, total) to each response and aggregates per-route histograms and the
+# statements with the most SQL time for /metrics (per process). SLOW_QUERY_MS=<ms> logs statements
+# slower than that to the 'therrc.sql' logger. With neither set, no hook is installed.
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name, self.help_text, self.buckets = name, help_text, buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.setdefault(labels, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound: series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    # Prometheus text exposition: cumulative buckets, then _sum and _count per label set.
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                for bound, c in zip(self.buckets, counts): lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {c}')
+                lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+                lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+                lines.append(f'{self.name}_count{{{label_text}}} {count}')
+        return "\n".join(lines)
+
+# SQL time per normalized statement, summed over the requests it was among the slowest of; /metrics
+# shows the `keep` statements with the most time. Trimmed to its top half once it tracks max_statements.
+class StatementTotals:
+    def __init__(self, name, help_text, keep=10, max_statements=1000):
+        self.name, self.help_text, self.keep, self.max_statements = name, help_text, keep, max_statements
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def observe(self, slowest):
+        with self._lock:
+            for seconds, sql in slowest:
+                total = self._totals.setdefault(sql, [0.0, 0])
+                total[0] += seconds
+                total[1] += 1
+            if len(self._totals) > self.max_statements:
+                self._totals = dict(sorted(self._totals.items(), key=lambda item: -item[1][0])[:self.max_statements // 2])
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} summary"]
+        with self._lock: top = sorted(self._totals.items(), key=lambda item: -item[1][0])[:self.keep]
+        for sql, (total, count) in top:
+            label = sql.replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'{self.name}_sum{{statement="{label}"}} {total}')
+            lines.append(f'{self.name}_count{{statement="{label}"}} {count}')
+        return "\n".join(lines)
+
+# A statement as a Server-Timing description, which is a quoted-string: quotes and backslashes are swapped out.
+def timing_description(sql, limit=120):
+    text = sql.replace('"', "'").replace('\\', '/')
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def install_request_profiling(app, query_profiler, histograms, statement_totals):
+    request_seconds, request_sql_seconds, request_queries = histograms
+    slow_ms, instrumentation = app.config['SLOW_QUERY_MS'], app.config['INSTRUMENTATION']
+
+    @app.before_request
+    def start_request_profile():
+        g.request_started = time.perf_counter()
+        g.timing_spans = []
+        query_profiler.start()
+
+    @app.after_request
+    def finish_request_profile(response):
+        stats = query_profiler.stop()
+        if stats is None: return response
+        total = time.perf_counter() - g.request_started
+        if slow_ms is not None:
+            for seconds, sql in stats['slowest']:
+                if seconds * 1000 >= slow_ms: query_profiler.log_slow(seconds, sql, f" ({request.method} {request.path})")
+        if instrumentation:
+            timings = [f'sql;dur={stats["seconds"] * 1000:.2f};desc="{stats["queries"]} queries"']
+            timings += [f'sql-{i};dur={seconds * 1000:.2f};desc="{timing_description(sql)}"' for i, (seconds, sql) in enumerate(stats['slowest'], 1)]
+            timings += [f'{name};dur={seconds * 1000:.2f}' for name, seconds in g.timing_spans]
+            timings.append(f'total;dur={total * 1000:.2f}')
+            response.headers['Server-Timing'] = ", ".join(timings)
+            labels = (('route', request.url_rule.rule if request.url_rule else 'unmatched'), ('method', request.method))
+            request_seconds.observe(labels, total)
+            request_sql_seconds.observe(labels, stats['seconds'])
+            request_queries.observe(labels, stats['queries'])
+            statement_totals.observe(stats['slowest'])
+        return response
+
+# Times a block of the current request for Server-Timing, excluding the SQL run inside it
+# (that is already reported as 'sql'). A no-op unless INSTRUMENTATION is on.
+def timed_span(name):
+    return _timed_span(services().query_profiler, name) if current_app.config['INSTRUMENTATION'] else nullcontext()
+
+@contextmanager
+def _timed_span(query_profiler, name):
+    sql_before, start = query_profiler.current_seconds(), time.perf_counter()
+    try:
+        yield
+    finally:
+        g.timing_spans.append((name, time.perf_counter() - start - (query_profiler.current_seconds() - sql_before)))
+
+# --- Admin Writes ---
+# Every admin mutation runs on the database's writer thread via write(): mutations that arrive
+# together share one transaction (group commit), each isolated by a savepoint, so one request's
+# result and promotions land atomically and a failing request rolls back alone. Events are
+# published by the caller after write() returns, i.e. after the commit. The command's queries are
+# recorded into the calling request's profile, so Server-Timing and the histograms count them.
+def write(fn, *args, **kwargs):
+    app, query_profiler = current_app._get_current_object(), services().query_profiler
+    stats = query_profiler.current() if query_profiler else None
+    def command():
+        with app.app_context(), (query_profiler.attach(stats) if query_profiler else nullcontext()):
+            return fn(*args, **kwargs)
+    return db_manager.submit(command).result()
+
+# --- PDF Report Worker ---
+# Reports are rendered on one background thread and stored on disk per tournament version;
+# request threads only ever check for the file or enqueue the job.
+def report_path(tournament_id, version):
+    return os.path.join(services().reports_dir, f"season_{tournament_id}_v{version}.pdf")
+
+# Runs on the worker thread, which needs its own app context for the names above.
+def generate_report(app, tournament_id, version):
+    with app.app_context():
+        svc, path = services(), report_path(tournament_id, version)
+        try:
+            os.makedirs(svc.reports_dir, exist_ok=True)
+            build_pdf_report(load_tournament_payload(tournament_id, version), path)
+            for stale in glob.glob(os.path.join(svc.reports_dir, f"season_{tournament_id}_v*.pdf")):
+                if stale != path: os.remove(stale)
+        except Exception as e:
+            print(f"Error generating report: {e}")
+            with svc.report_jobs_lock: svc.report_failures[path] = str(e)
+        finally:
+            with svc.report_jobs_lock: svc.report_jobs.pop(path, None)
+
+def enqueue_report(tournament_id, version):
+    svc, path = services(), report_path(tournament_id, version)
+    with svc.report_jobs_lock:
+        if path not in svc.report_jobs: svc.report_jobs[path] = svc.report_executor.submit(generate_report, current_app._get_current_object(), tournament_id, version)
+
+# --- Simulation Worker ---
+# Qualification odds are simulated on one background thread, like the PDF reports, and kept in
+# simulation_cache per tournament version. Only the SIMULATION_RUNS sizes can be asked for, so the
+# cache cannot be bypassed by varying runs.
+SIMULATION_RUNS = (1000, 10000, 50000)
+
+def run_simulation(app, tournament_id, runs, version):
+    with app.app_context():
+        svc, key = services(), (tournament_id, runs)
+        try:
+            svc.simulation_cache.put(key, version, dict(svc.season_simulator.run(tournament_id, runs), version=version))
+        except Exception as e:
+            print(f"Error running simulation: {e}")
+            with svc.simulation_jobs_lock: svc.simulation_failures[(*key, version)] = str(e)
+        finally:
+            with svc.simulation_jobs_lock: svc.simulation_jobs.pop((*key, version), None)
+
+def enqueue_simulation(tournament_id, runs, version):
+    svc, job = services(), (tournament_id, runs, version)
+    with svc.simulation_jobs_lock:
+        if job not in svc.simulation_jobs: svc.simulation_jobs[job] = svc.simulation_executor.submit(run_simulation, current_app._get_current_object(), tournament_id, runs, version)
+
+# --- Season Archive ---
+# Once every fixture of a season is played, its /api/tournaments/<id> payload is frozen to a gzip'd
+# snapshot named after the version it was taken at. While that version is current, the route sends the
+# snapshot bytes as they are, at /api/tournaments/<id>?v=<version>: that URL never changes content, so it
+# is cached for a year without revalidation. The bare URL (and ?since=) redirects there. A later correction
+# bumps the version, so the live tables take over again until the promotion pass that follows it archives
+# the season anew under a new ?v=.
+ARCHIVE_MAX_AGE = 365 * 24 * 3600
+def archive_path(tournament_id, version):
+    return os.path.join(services().archive_dir, f"season_{tournament_id}_v{version}.json.gz")
+
+def read_archive(path):
+    with gzip.open(path, 'rb') as f: return json.load(f)
+
+# Returns the snapshot path, or None if the season is missing or not complete. The snapshot is read inside
+# a write transaction: it waits for the write that completed the season to commit and holds off any other.
+def archive_season(tournament_id, purge=False, pdf=False):
+    svc = services()
+    with db_manager.connections.writer():
+        state = db_manager.get_tournament_state(tournament_id)
+        if state is None: return None
+        version = state['version']
+        path = archive_path(tournament_id, version)
+        if state['purged']: return path
+        if not db_manager.is_season_complete(tournament_id): return None
+        if state['archived_version'] != version or not os.path.exists(path):
+            os.makedirs(svc.archive_dir, exist_ok=True)
+            body = current_app.json.dumps(build_tournament_payload(tournament_id, version)).encode()
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f: f.write(gzip.compress(body, compresslevel=9, mtime=0))
+            os.replace(tmp, path)
+            db_manager.set_archived_version(tournament_id, version)
+            for stale in glob.glob(os.path.join(svc.archive_dir, f"season_{tournament_id}_v*.json.gz")):
+                if stale != path: os.remove(stale)
+        if purge: db_manager.purge_tournament_rows(tournament_id)
+    if pdf and not os.path.exists(report_path(tournament_id, version)): generate_report(current_app._get_current_object(), tournament_id, version)
+    return path
+
+# The payload at `version`: the season's snapshot if it was archived at that version, else the live tables.
+def load_tournament_payload(tournament_id, version):
+    state = db_manager.get_tournament_state(tournament_id)
+    if state and state['archived_version'] == version and os.path.exists(archive_path(tournament_id, version)):
+        return read_archive(archive_path(tournament_id, version))
+    return build_tournament_payload(tournament_id, version)
+
+# (team1_name, team2_name, (goals1, goals2)) per played fixture of a snapshot; once a season is purged
+# it is the only copy of its results left for the all-time tables.
+def archived_results(tournament_id, version):
+    payload = read_archive(archive_path(tournament_id, version))
+    return [(f['team1_name'], f['team2_name'], (f['team1_goals'], f['team2_goals'])) for f in payload['fixtures'] if f['status'] == 'Played']
+
+def purged_season_results():
+    return [result for row in db_manager.get_purged_tournaments() for result in archived_results(row['tournament_id'], row['archived_version'])]
+
+# Wired to TournamentApp.on_season_complete; runs on the report worker thread.
+def run_archive_job(app, tournament_id):
+    with app.app_context():
+        try:
+            archive_season(tournament_id, pdf=current_app.config['ARCHIVE_PDF'])
+        except Exception as e:
+            print(f"Error archiving season: {e}")
+
+# The snapshot response, or None if its file is gone (the live tables answer instead).
+def archived_response(tournament_id, version):
+    etag = f"t{tournament_id}-v{version}"
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        try:
+            with open(archive_path(tournament_id, version), 'rb') as f: body = f.read()
+        except FileNotFoundError:
+            return None
+        if 'gzip' in request.accept_encodings:
+            response = current_app.response_class(body, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = current_app.response_class(gzip.decompress(body), mimetype='application/json')
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = f'public, max-age={ARCHIVE_MAX_AGE}, immutable'
+    return response
+
+# --- Payload Encodings ---
+# The /api/tournaments/<id> body is serialized once per version and compressed at most once per version
+# and encoding (gzip, plus brotli when the optional `brotli` package is installed). The Flask route and
+# the asyncio front (asgi.py) both serve these bytes.
+PAYLOAD_ENCODINGS = ('br', 'gzip') if importlib.util.find_spec('brotli') else ('gzip',)
+
+def compress_body(body, encoding):
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+# encoding: one of PAYLOAD_ENCODINGS, or None for the plain JSON.
+def tournament_body(tournament_id, version, encoding=None):
+    bodies = payload_cache.get(tournament_id, version)
+    if bodies is None:
+        with timed_span('build'): payload = build_tournament_payload(tournament_id, version)
+        with timed_span('json'): bodies = {None: current_app.json.dumps(payload).encode()}
+        payload_cache.put(tournament_id, version, bodies)
+    if encoding not in bodies:
+        with timed_span('compress'): bodies[encoding] = compress_body(bodies[None], encoding)
+    return bodies[encoding]
+
+# A worker never migrates the schema itself: until `flask --app app init-db` has run, every route answers 503.
+@bp.before_request
+def require_schema():
+    svc = services()
+    if svc.schema_ready: return None
+    svc.schema_ready = svc.db_manager.schema_is_current()
+    if not svc.schema_ready:
+        return jsonify({'success': False, 'message': 'The database schema is not initialized; run `flask --app app init-db`.'}), 503
+
+# --- Page Routes ---
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/standings')
-@app.route('/standings/<int:tournament_id>')
+@bp.route('/standings')
+@bp.route('/standings/<int:tournament_id>')
 def standings(tournament_id=None):
     return render_template('standings.html', preselected_id=tournament_id, active_page='standings')
 
-@app.route('/fixtures')
-@app.route('/fixtures/<int:tournament_id>')
+@bp.route('/fixtures')
+@bp.route('/fixtures/<int:tournament_id>')
 def fixtures(tournament_id=None):
     return render_template('fixtures.html', preselected_id=tournament_id, active_page='fixtures')
 
-@app.route('/reports')
-@app.route('/reports/<int:tournament_id>')
+@bp.route('/reports')
+@bp.route('/reports/<int:tournament_id>')
 def reports(tournament_id=None):
     return render_template('reports.html', preselected_id=tournament_id, active_page='reports')
 
-@app.route('/about')
+@bp.route('/about')
 def about():
     return render_template('about.html', active_page='about')
 
-@app.route('/admin', methods=['GET', 'POST'])
+@bp.route('/admin', methods=['GET', 'POST'])
 def admin_login():
     error = None
     if request.method == 'POST':
-        if request.form.get('password') == ADMIN_PASSWORD:
+        if request.form.get('password') == current_app.config['ADMIN_PASSWORD']:
             session['logged_in'] = True
-            return redirect(url_for('admin_dashboard'))
+            return redirect(url_for('.admin_dashboard'))
         else:
             error = 'Invalid password. Please try again.'
     return render_template('admin_login.html', error=error)
 
-@app.route('/admin/dashboard')
+@bp.route('/admin/dashboard')
 def admin_dashboard():
-    if not session.get('logged_in'): return redirect(url_for('admin_login'))
+    if not session.get('logged_in'): return redirect(url_for('.admin_login'))
     tournaments = db_manager.get_all_tournaments()
     return render_template('admin_dashboard.html', tournaments=tournaments)
 
-@app.route('/admin/manage/<int:tournament_id>')
+@bp.route('/admin/manage/<int:tournament_id>')
 def manage_tournament(tournament_id):
-    if not session.get('logged_in'): return redirect(url_for('admin_login'))
+    if not session.get('logged_in'): return redirect(url_for('.admin_login'))
     tournament_info = db_manager.get_tournament_by_id(tournament_id)
     fixtures = db_manager.get_all_fixtures(tournament_id)
     return render_template('manage_tournament.html', tournament=tournament_info, fixtures=fixtures)
 
-@app.route('/admin/logout')
+@bp.route('/admin/logout')
 def logout():
     session.pop('logged_in', None)
-    return redirect(url_for('index'))
+    return redirect(url_for('.index'))
 
 # --- API Routes ---
-
-# (get_tournaments and get_tournament_data are unchanged)
-@app.route('/api/tournaments')
+@bp.route('/api/tournaments')
 def get_tournaments():
     tournaments_raw = db_manager.get_all_tournaments()
     tournaments_list = [dict(row) for row in tournaments_raw]
     return jsonify(tournaments_list)
 
-@app.route('/api/tournaments/<int:tournament_id>')
+@bp.route('/api/tournaments/<int:tournament_id>')
 def get_tournament_data(tournament_id):
-    all_teams = db_manager.get_all_teams(tournament_id)
-    all_fixtures = db_manager.get_all_fixtures(tournament_id)
+    # The version is read before the data, so a cached body is never older than its version.
+    state = db_manager.get_tournament_state(tournament_id)
+    if state is None: return jsonify(build_tournament_payload(tournament_id))
+    version = state['version']
+    # An archived season answers every read, ?since= included, with its snapshot at the versioned URL.
+    if state['archived_version'] == version and os.path.exists(archive_path(tournament_id, version)):
+        if request.args.get('v', type=int) != version:
+            response = redirect(url_for('.get_tournament_data', tournament_id=tournament_id, v=version))
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        response = archived_response(tournament_id, version)
+        if response is not None: return response
+    # ?since=<version>: only the rows changed after that version. A version from the future
+    # (e.g. a recreated database) gets the full payload, which has no 'since' key.
+    since = request.args.get('since', type=int)
+    if since is not None and 0 <= since <= version:
+        etag = f"t{tournament_id}-v{version}-s{since}"
+        response = current_app.response_class(status=304) if etag in request.if_none_match else jsonify(build_tournament_delta(tournament_id, since, version))
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    etag = f"t{tournament_id}-v{version}"
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        encoding = request.accept_encodings.best_match(PAYLOAD_ENCODINGS)
+        response = current_app.response_class(tournament_body(tournament_id, version, encoding), mimetype='application/json')
+        if encoding: response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Serves the cached PDF for the current version, or queues its generation and answers 202 until it exists.
+@bp.route('/api/tournaments/<int:tournament_id>/report.pdf')
+def get_tournament_report(tournament_id):
+    version = db_manager.get_tournament_version(tournament_id)
+    if version is None: return jsonify({'success': False, 'message': 'Tournament not found'}), 404
+    path = report_path(tournament_id, version)
+    # A failed generation is reported once; the request after that queues a fresh attempt.
+    with services().report_jobs_lock: error = services().report_failures.pop(path, None)
+    if error is not None: return jsonify({'success': False, 'status': 'failed', 'message': f'The report could not be generated: {error}'}), 500
+    if not os.path.exists(path):
+        enqueue_report(tournament_id, version)
+        response = jsonify({'success': True, 'status': 'pending', 'message': 'The report is being generated.'})
+        response.status_code = 202
+        response.headers['Retry-After'] = '2'
+        return response
+    response = send_file(os.path.abspath(path), mimetype='application/pdf', as_attachment=True, download_name=f"season_{tournament_id}_report.pdf",
+                         etag=f"r{tournament_id}-v{version}", conditional=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Monte Carlo qualification odds for the current version, or 202 while the simulation worker runs them.
+@bp.route('/api/tournaments/<int:tournament_id>/probabilities')
+def get_qualification_probabilities(tournament_id):
+    version = db_manager.get_tournament_version(tournament_id)
+    if version is None: return jsonify({'success': False, 'message': 'Tournament not found'}), 404
+    runs = request.args.get('runs', 10000, type=int)
+    if runs not in SIMULATION_RUNS: return jsonify({'success': False, 'message': f"runs must be one of {', '.join(map(str, SIMULATION_RUNS))}"}), 400
+    result = simulation_cache.get((tournament_id, runs), version)
+    if result is not None: return jsonify(result)
+    # A failed simulation is reported once; the request after that queues a fresh attempt.
+    with services().simulation_jobs_lock: error = services().simulation_failures.pop((tournament_id, runs, version), None)
+    if error is not None: return jsonify({'success': False, 'status': 'failed', 'message': f'The simulation failed: {error}'}), 500
+    enqueue_simulation(tournament_id, runs, version)
+    response = jsonify({'success': True, 'status': 'pending', 'message': 'The simulation is running.'})
+    response.status_code = 202
+    response.headers['Retry-After'] = '2'
+    return response
+
+# Live updates for one tournament as Server-Sent Events; see EventBroadcaster for the event buffer.
+# An open stream holds its worker for as long as the page stays open, so streams are only served by a
+# server that runs requests on threads (LIVE_STREAM unset: wsgi.multithread) or when LIVE_STREAM=1 says
+# so (gevent/eventlet workers). Otherwise the route answers 204, which tells EventSource to stop
+# reconnecting, and the pages fall back to ?since= polling (see static/live-updates.js). At most
+# LIVE_STREAM_MAX streams are open per process, so viewers always leave threads for admin writes;
+# past that the route answers 503, which the pages handle the same way.
+def live_stream_enabled():
+    enabled = current_app.config['LIVE_STREAM']
+    return bool(request.environ.get('wsgi.multithread')) if enabled is None else enabled
+
+@bp.route('/api/tournaments/<int:tournament_id>/stream')
+def stream_tournament(tournament_id):
+    if not live_stream_enabled(): return current_app.response_class(status=204)
+    version = db_manager.get_tournament_version(tournament_id)
+    if version is None: return jsonify({'success': False, 'message': 'Tournament not found'}), 404
+    stream_slots = services().stream_slots
+    if not stream_slots.acquire(blocking=False):
+        response = jsonify({'success': False, 'message': 'Too many open event streams'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    # A fresh subscriber passes the version of the payload it rendered, so a change that landed
+    # between that fetch and this request is caught straight away.
+    client_version = request.args.get('version', type=int) if last_id is None else None
+
+    def events(seen_version):
+        yield "retry: 3000\n\n"
+        if client_version is not None and client_version != seen_version: yield sse_message('refresh', {'version': seen_version})
+        for batch, missed in broadcaster.listen(tournament_id, last_id):
+            if missed: yield sse_message('refresh', {'version': seen_version})
+            for event_id, event, data in batch:
+                if data.get('version') is not None: seen_version = data['version']
+                yield sse_message(event, data, event_id)
+            if not batch:
+                current = db_manager.get_tournament_version(tournament_id)
+                if current != seen_version:
+                    seen_version = current
+                    yield sse_message('refresh', {'version': current})
+                else:
+                    yield ": keep-alive\n\n"
+
+    response = current_app.response_class(stream_with_context(events(version)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # The slot is given back when the server closes the response, whether or not the body was started.
+    response.call_on_close(stream_slots.release)
+    return response
+
+# --- All-Time Routes ---
+# Served from the materialized all-time tables (see DatabaseManager), so their cost does not grow with
+# the number of seasons. Team names are matched the way they are stored: trimmed and uppercased.
+def normalize_team_name(name):
+    return (name or '').strip().upper()
+
+@bp.route('/api/all_time/standings')
+def get_all_time_standings():
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    return jsonify({'standings': db_manager.get_all_time_standings(limit, offset), 'limit': limit, 'offset': offset})
+
+@bp.route('/api/all_time/head_to_head')
+def get_head_to_head():
+    team1, team2 = normalize_team_name(request.args.get('team1')), normalize_team_name(request.args.get('team2'))
+    if not team1 or not team2 or team1 == team2: return jsonify({'success': False, 'message': 'Pass two different teams as ?team1=&team2=.'}), 400
+    record = db_manager.get_head_to_head(team1, team2)
+    if record is None: record = {'team1': team1, 'team2': team2, 'matches_played': 0, 'team1_wins': 0, 'draws': 0, 'team2_wins': 0, 'team1_goals': 0, 'team2_goals': 0}
+    return jsonify(record)
+
+@bp.route('/api/all_time/teams/<team_name>')
+def get_team_all_time(team_name):
+    name = normalize_team_name(team_name)
+    seasons = db_manager.get_team_history(name)
+    if not seasons: return jsonify({'success': False, 'message': 'Team not found'}), 404
+    return jsonify({'name': name, 'all_time': db_manager.get_all_time_team(name), 'seasons': seasons})
+
+# The engine's rows are shared (cached per version), so payloads copy the public fields out.
+def standings_payload_row(row):
+    return {field: row[field] for field in StandingsEngine.FIELDS}
+
+# The read-only payloads are assembled straight from the database's row dicts (see the READ MODELS
+# in DatabaseManager) and the standings engine's ranked tables.
+def build_tournament_payload(tournament_id, version=None):
+    if version is None: version = db_manager.get_tournament_version(tournament_id)
     tournament_info = db_manager.get_tournament_by_id(tournament_id)
     settings = json.loads(tournament_info['settings']) if tournament_info and tournament_info['settings'] else {}
+    standings = {group_name: [standings_payload_row(row) for row in table] for group_name, table in db_manager.standings.tables(tournament_id, version).items()}
+    fixtures = db_manager.get_fixture_payload_rows(tournament_id)
+    for i, row in enumerate(fixtures): row['display_no'] = i + 1
+    return {'standings': standings, 'fixtures': fixtures, 'settings': settings, 'season_number': tournament_info['season_number'] if tournament_info else 'N/A', 'version': version}
+
+# Changed fixtures (merged by match_no; display_no never changes) and, per group with a changed
+# team, the changed rows plus the group's new order -- the same shape as the 'standings' live event.
+def build_tournament_delta(tournament_id, since, version):
     standings = {}
-    for team in all_teams:
-        if team.group_name not in standings: standings[team.group_name] = []
-        standings[team.group_name].append(team)
-    sorted_standings = {}
-    for group_name, teams in standings.items():
-        sorted_teams = sorted(teams, key=lambda t: (t.points, t.goal_difference, t.goals_for, t.name), reverse=True)
-        team_list = [{'name': t.name, 'matches_played': t.matches_played, 'wins': t.wins, 'draws': t.draws, 'losses': t.losses, 'goals_for': t.goals_for, 'goals_against': t.goals_against, 'goal_difference': t.goal_difference, 'points': t.points} for t in sorted_teams]
-        sorted_standings[group_name] = team_list
-    formatted_fixtures = []
-    for i, match in enumerate(all_fixtures): 
-        match_dict = {'display_no': i + 1, 'match_no': match.match_no, 'stage': match.stage, 'round_in_stage': match.round_in_stage, 'team1_name': match.team1_name, 'team2_name': match.team2_name, 'team1_goals': match.team1_goals, 'team2_goals': match.team2_goals, 'team1_pso': match.team1_pso, 'team2_pso': match.team2_pso, 'status': match.status}
-        formatted_fixtures.append(match_dict)
-    report_data = {'standings': sorted_standings, 'fixtures': formatted_fixtures, 'settings': settings, 'season_number': tournament_info['season_number'] if tournament_info else 'N/A'}
-    return jsonify(report_data)
+    for group_name, table in db_manager.standings.tables(tournament_id, version).items():
+        changed = [standings_payload_row(row) for row in table if row['change_seq'] > since]
+        if changed: standings[group_name] = {'order': [row['name'] for row in table], 'rows': changed}
+    return {'version': version, 'since': since, 'fixtures': db_manager.get_fixture_payload_rows(tournament_id, since), 'standings': standings}
 
 
+def tournament_settings(num_groups, num_teams_per_group, knockout_mode, num_legs):
+    total_qualifiers = knockout_size(knockout_mode)
+    return {"num_groups": num_groups, "num_teams_per_group": num_teams_per_group,
+            "is_league_mode": num_groups == 1, "knockout_mode": knockout_mode,
+            "qualifiers_per_group": total_qualifiers // num_groups if num_groups > 0 else 0,
+            "num_legs": num_legs}
+
+# Every group must send the same number of qualifiers into the bracket.
+def check_knockout_format(settings):
+    size, num_groups = knockout_size(settings['knockout_mode']), settings['num_groups']
+    if num_groups < 1: return "A tournament needs at least one group."
+    if size and (size % num_groups or settings['qualifiers_per_group'] > settings['num_teams_per_group']):
+        return f"A {size}-team knockout cannot take the same number of qualifiers from each of {num_groups} groups of {settings['num_teams_per_group']}."
+    return None
+
+# The default bracket the create form shows for a format, straight from the fixture generator.
+@bp.route('/api/admin/bracket_preview')
+def bracket_preview_api():
+    if not session.get('logged_in'): return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    settings = tournament_settings(request.args.get('num_groups', 1, type=int), request.args.get('num_teams_per_group', 0, type=int),
+                                   request.args.get('knockout_mode', '0'), 1)
+    error = check_knockout_format(settings)
+    if error: return jsonify({'success': False, 'message': error}), 400
+    fixtures = [{'stage': row[5], 'round': row[6], 'team1': row[3], 'team2': row[4]} for row in tournament_app.generate_knockout_fixtures(None, settings)]
+    return jsonify({'success': True, 'fixtures': fixtures})
+
 # <<< MAJOR UPDATE TO THIS FUNCTION TO HANDLE CUSTOM BRACKETS >>>
-@app.route('/api/admin/create', methods=['POST'])
+@bp.route('/api/admin/create', methods=['POST'])
 def create_tournament_api():
     if not session.get('logged_in'):
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
@@ -110,33 +675,11 @@ def create_tournament_api():
         num_groups = int(data['num_groups'])
         num_teams_per_group = int(data['num_teams_per_group'])
         knockout_mode = data['knockout_mode']
-        knockout_teams_map = {'1': 2, '2': 4, '3': 8}
-        total_qualifiers = knockout_teams_map.get(knockout_mode, 0)
-        
-        settings = {
-            "num_groups": num_groups, "num_teams_per_group": num_teams_per_group,
-            "is_league_mode": num_groups == 1, "knockout_mode": knockout_mode,
-            "qualifiers_per_group": total_qualifiers // num_groups if num_groups > 0 else 0, 
-            "num_legs": int(data['num_legs'])
-        }
+        settings = tournament_settings(num_groups, num_teams_per_group, knockout_mode, int(data['num_legs']))
+        error = check_knockout_format(settings)
+        if error: return jsonify({'success': False, 'message': error}), 400
         settings_json = json.dumps(settings)
         season_number = int(data['season_number'])
-        tournament_id = db_manager.create_new_tournament(season_number, settings_json)
-        
-        group_names = ['A', 'B', 'C', 'D']
-        for i in range(num_groups):
-            group_name = group_names[i]
-            for j in range(num_teams_per_group):
-                team_name = data[f'team_{group_name}_{j}']
-                db_manager.add_team(tournament_id, team_name.strip().upper(), group_name)
-
-        all_teams_in_db = db_manager.get_all_teams(tournament_id)
-        team_ids_by_group = {g: [] for g in group_names[:num_groups]}
-        for team in all_teams_in_db:
-            team_ids_by_group[team.group_name].append(team.team_id)
-
-        # --- 2. Generate Fixtures (New Logic) ---
-        tournament_app.generate_group_stage_fixtures(tournament_id, settings, team_ids_by_group)
         
         custom_qf_pairings, custom_sf_pairings = None, None
         if data.get('knockout_brackets_type') == 'custom':
@@ -163,15 +706,28 @@ def create_tournament_api():
                     t2 = data.get(f'custom_qf_match_{i}_t2')
                     if t1 and t2: custom_sf_pairings.append((t1, t2))
 
-        tournament_app.generate_knockout_fixtures(tournament_id, settings, custom_qf_pairings, custom_sf_pairings)
+        # --- 2. Write tournament, teams and fixtures in a single transaction ---
+        group_names = group_labels(num_groups)
+        def create_season():
+            with db_manager.batch() as batch:
+                tournament_id = batch.create_tournament(season_number, settings_json)
+                batch.add_teams(tournament_id, ((data[f'team_{g}_{j}'].strip().upper(), g) for g in group_names for j in range(num_teams_per_group)))
+
+                team_ids_by_group = {g: [] for g in group_names}
+                for team in db_manager.get_all_teams(tournament_id):
+                    team_ids_by_group[team.group_name].append(team.team_id)
+
+                batch.add_fixtures(tournament_app.generate_group_stage_fixtures(tournament_id, settings, team_ids_by_group))
+                batch.add_fixtures(tournament_app.generate_knockout_fixtures(tournament_id, settings, custom_qf_pairings, custom_sf_pairings))
+                tournament_app.build_bracket_graph(tournament_id)
+        write(create_season)
 
         return jsonify({'success': True, 'message': f'Successfully created Season {season_number}!'})
     except Exception as e:
         print(f"Error creating tournament: {e}")
         return jsonify({'success': False, 'message': f'An error occurred: {e}'}), 500
 
-# (update_result, delete_tournament, and autogenerate_api are unchanged)
-@app.route('/api/admin/update_result', methods=['POST'])
+@bp.route('/api/admin/update_result', methods=['POST'])
 def update_result_api():
     if not session.get('logged_in'): return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     data = request.get_json()
@@ -184,36 +740,241 @@ def update_result_api():
         match = db_manager.get_fixture_by_id(match_no)
         if not match: return jsonify({'success': False, 'message': 'Match not found'}), 404
         if not match.team1 or not match.team2: return jsonify({'success': False, 'message': 'Cannot enter result for a match with placeholder teams.'}), 400
-        match.update_stats(team1_goals, team2_goals, pso_t1, pso_t2)
-        tournament_app.check_and_promote(match.tournament_id)
+        match, fills = write(tournament_app.enter_result, match_no, team1_goals, team2_goals, pso_t1, pso_t2)
+        publish_result(match, fills)
         return jsonify({'success': True, 'message': f'Result for Match {match_no} updated successfully!'})
     except Exception as e:
         print(f"Error updating result: {e}")
         return jsonify({'success': False, 'message': f'An error occurred: {e}'}), 500
 
-@app.route('/api/admin/delete/<int:tournament_id>', methods=['POST'])
+@bp.route('/api/admin/delete/<int:tournament_id>', methods=['POST'])
 def delete_tournament_api(tournament_id):
     if not session.get('logged_in'): return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     try:
         tournament_info = db_manager.get_tournament_by_id(tournament_id)
         if not tournament_info: return jsonify({'success': False, 'message': 'Tournament not found'}), 404
-        db_manager.delete_tournament(tournament_id)
-        return jsonify({'success': True, 'message': f'Successfully deleted Season {tournament_info["season_number"]}.'})
+        try:
+            archived = archived_results(tournament_id, tournament_info['archived_version']) if tournament_info['purged'] else ()
+        except FileNotFoundError:
+            archived = None  # a purged season without its snapshot: its results cannot be subtracted...
+        write(db_manager.delete_tournament, tournament_id, archived or ())
+        payload_cache.discard(tournament_id)
+        warning = ""
+        if archived is None:
+            # ...so the all-time tables are rebuilt from what is left instead.
+            try: write(db_manager.rebuild_all_time, purged_season_results())
+            except FileNotFoundError as e: warning = f" The all-time tables could not be rebuilt: {e}"
+        publish_refresh(tournament_id)
+        for path in glob.glob(os.path.join(services().reports_dir, f"season_{tournament_id}_v*.pdf")): os.remove(path)
+        for path in glob.glob(os.path.join(services().archive_dir, f"season_{tournament_id}_v*.json.gz")): os.remove(path)
+        return jsonify({'success': True, 'message': f'Successfully deleted Season {tournament_info["season_number"]}.{warning}'})
     except Exception as e:
         print(f"Error deleting tournament: {e}")
         return jsonify({'success': False, 'message': f'An error occurred: {e}'}), 500
 
-@app.route('/api/admin/autogenerate/<int:tournament_id>', methods=['POST'])
+@bp.route('/api/admin/autogenerate/<int:tournament_id>', methods=['POST'])
 def autogenerate_api(tournament_id):
     if not session.get('logged_in'): return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     try:
-        updated_count = tournament_app.autogenerate_group_results(tournament_id)
+        data = request.get_json(silent=True) or {}
+        seed = int(data['seed']) if data.get('seed') is not None else None
+        updated_count = write(tournament_app.autogenerate_group_results, tournament_id, seed)
+        if updated_count > 0: publish_refresh(tournament_id)
         message = f"Successfully generated random results for {updated_count} matches." if updated_count > 0 else "No group stage matches needed to be updated."
         return jsonify({'success': True, 'message': message})
     except Exception as e:
         print(f"Error autogenerating results: {e}")
         return jsonify({'success': False, 'message': f'An error occurred: {e}'}), 500
 
+IMPORT_SPOOL_MEMORY = 1024 * 1024  # request bodies above this are spooled to a temp file
+
+def spool_request_body():
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MEMORY)
+    shutil.copyfileobj(request.stream, spool)
+    spool.seek(0)
+    return spool
+
+# Bulk results as CSV or JSONL, either the raw request body or an uploaded `file` (format from ?format=,
+# the file name or the content type). The body is read row by row and every valid row is applied in one
+# transaction; rejected rows come back with their line numbers.
+@bp.route('/api/admin/import_results/<int:tournament_id>', methods=['POST'])
+def import_results_api(tournament_id):
+    if not session.get('logged_in'): return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    try:
+        if not db_manager.get_tournament_by_id(tournament_id): return jsonify({'success': False, 'message': 'Tournament not found'}), 404
+        upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+        fmt = request.args.get('format') or result_file_format(upload.filename if upload else None, upload.mimetype if upload else request.mimetype)
+        if fmt not in ('csv', 'jsonl'): return jsonify({'success': False, 'message': 'Send CSV or JSONL results (or pass ?format=csv|jsonl).'}), 400
+        # The body is taken off the socket here (multipart parsing already spools the file part), so the
+        # rows are read from memory or a local temp file inside the write transaction, never from a slow client.
+        with (nullcontext(upload.stream) if upload else spool_request_body()) as body:
+            stream = io.TextIOWrapper(body, encoding='utf-8-sig', newline='')
+            applied, errors, fills = write(tournament_app.import_results, tournament_id, read_result_records(stream, fmt))
+        if applied: publish_refresh(tournament_id)
+        message = f"Imported {len(applied)} results" + (f", {len(errors)} rows rejected." if errors else ".")
+        return jsonify({'success': True, 'message': message, 'applied': len(applied), 'promoted': len(fills), 'errors': errors})
+    except Exception as e:
+        print(f"Error importing results: {e}")
+        return jsonify({'success': False, 'message': f'An error occurred: {e}'}), 500
+
+@bp.route('/api/admin/rebuild_standings/<int:tournament_id>', methods=['POST'])
+def rebuild_standings_api(tournament_id):
+    if not session.get('logged_in'): return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    try:
+        repaired = write(db_manager.rebuild_standings, tournament_id)
+        if repaired: publish_refresh(tournament_id)
+        message = f"Repaired standings for {len(repaired)} teams." if repaired else "Standings verified, no drift found."
+        return jsonify({'success': True, 'message': message, 'repaired_team_ids': repaired})
+    except Exception as e:
+        print(f"Error rebuilding standings: {e}")
+        return jsonify({'success': False, 'message': f'An error occurred: {e}'}), 500
+
+@bp.route('/api/admin/rebuild_all_time', methods=['POST'])
+def rebuild_all_time_api():
+    if not session.get('logged_in'): return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    try:
+        teams = write(db_manager.rebuild_all_time, purged_season_results())
+        return jsonify({'success': True, 'message': f"Rebuilt the all-time tables for {teams} teams."})
+    except Exception as e:
+        print(f"Error rebuilding all-time tables: {e}")
+        return jsonify({'success': False, 'message': f'An error occurred: {e}'}), 500
+
+# On-demand archive of a completed season; {"purge": true} also drops its rows from the live tables
+# and {"pdf": true} renders its report alongside the snapshot.
+@bp.route('/api/admin/archive/<int:tournament_id>', methods=['POST'])
+def archive_season_api(tournament_id):
+    if not session.get('logged_in'): return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    try:
+        tournament_info = db_manager.get_tournament_by_id(tournament_id)
+        if not tournament_info: return jsonify({'success': False, 'message': 'Tournament not found'}), 404
+        data = request.get_json(silent=True) or {}
+        path = archive_season(tournament_id, purge=bool(data.get('purge')), pdf=bool(data.get('pdf')))
+        if path is None: return jsonify({'success': False, 'message': 'Only a season with every fixture played can be archived.'}), 409
+        payload_cache.discard(tournament_id)
+        return jsonify({'success': True, 'message': f'Archived Season {tournament_info["season_number"]}.', 'bytes': os.path.getsize(path), 'purged': bool(data.get('purge')) or bool(tournament_info['purged'])})
+    except Exception as e:
+        print(f"Error archiving season: {e}")
+        return jsonify({'success': False, 'message': f'An error occurred: {e}'}), 500
+
+@bp.route('/metrics')
+def metrics():
+    if not current_app.config['INSTRUMENTATION']: return jsonify({'success': False, 'message': 'Instrumentation is disabled'}), 404
+    body = "\n".join(h.render() for h in (*services().histograms, services().statement_totals)) + "\n"
+    return current_app.response_class(body, mimetype='text/plain; version=0.0.4')
+
+# --- CLI ---
+# `flask --app app init-db`: creates the schema or applies pending migrations. Run it once per
+# deploy, before starting the workers.
+@bp.cli.command('init-db')
+def init_db_command():
+    db_manager.create_tables()
+    print(f"Database {current_app.config['DATABASE']} is at schema version {len(db_manager.migrations())}.")
+
+# `flask --app app import-results 3 matchday.csv`: the bulk import above from a file; exits 1 if any row was rejected.
+@bp.cli.command('import-results')
+@click.argument('tournament_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help="defaults to the file extension")
+def import_results_command(tournament_id, path, fmt):
+    fmt = fmt or result_file_format(path)
+    if fmt is None: raise click.UsageError("Cannot tell the format from the file name; pass --format csv|jsonl.")
+    if not db_manager.get_tournament_by_id(tournament_id): raise click.UsageError(f"Tournament {tournament_id} not found.")
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        applied, errors, fills = tournament_app.import_results(tournament_id, read_result_records(f, fmt))
+    for error in errors: print(f"line {error['line']}: {error['message']}")
+    print(f"{len(applied)} results imported, {len(fills)} bracket slots filled, {len(errors)} rows rejected.")
+    if errors: raise SystemExit(1)
+
+# `flask --app app rebuild-all-time`: recomputes the all-time and head-to-head tables from every season's results.
+@bp.cli.command('rebuild-all-time')
+def rebuild_all_time_command():
+    print(f"Rebuilt the all-time tables for {db_manager.rebuild_all_time(purged_season_results())} teams.")
+
+# `flask --app app archive-seasons [ID...]`: archives the given seasons, or every completed one.
+@bp.cli.command('archive-seasons')
+@click.argument('tournament_ids', type=int, nargs=-1)
+@click.option('--purge', is_flag=True, help="also drop the archived seasons' rows from the live tables")
+@click.option('--pdf', is_flag=True, help="also render each season's PDF report")
+def archive_seasons_command(tournament_ids, purge, pdf):
+    for tournament_id in tournament_ids or [row['tournament_id'] for row in db_manager.get_all_tournaments()]:
+        path = archive_season(tournament_id, purge=purge, pdf=pdf)
+        print(f"Season {tournament_id}: {f'archived to {path}' if path else 'not complete, skipped'}.")
+
+# `flask --app app check-query-plans`: fails (exit 1) if any hot query falls back to a full table scan.
+@bp.cli.command('check-query-plans')
+def check_query_plans_command():
+    results = check_query_plans()
+    for sql, details, scans in results:
+        print(f"{'FULL SCAN' if scans else 'ok':9}  {sql}")
+        for detail in details: print(f"           {detail}")
+    failures = [sql for sql, details, scans in results if scans]
+    print(f"{len(results)} statements checked, {len(failures)} with full table scans.")
+    if failures: raise SystemExit(1)
+
+# --- Application Factory ---
+# Everything one app instance owns. Connections open lazily in whichever process first uses them
+# (so prefork workers each get their own), and numpy is only imported by the first simulation.
+class TournamentServices:
+    def __init__(self, config):
+        self.db_manager = DatabaseManager(config['DATABASE'])
+        self.db_manager.connections.group_window = config['WRITE_GROUP_WINDOW_MS'] / 1000
+        self.tournament_app = TournamentApp(self.db_manager)
+        self.reports_dir = config['REPORTS_DIR']
+        self.archive_dir = config['ARCHIVE_DIR']
+        self.payload_cache = VersionedCache()
+        self.simulation_cache = VersionedCache(max_entries=16)
+        self.broadcaster = EventBroadcaster()
+        self.stream_slots = threading.BoundedSemaphore(config['LIVE_STREAM_MAX'])
+        self.report_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-report')
+        self.report_jobs = {}
+        self.report_failures = {}
+        self.report_jobs_lock = threading.Lock()
+        self.simulation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='simulation')
+        self.simulation_jobs = {}
+        self.simulation_failures = {}
+        self.simulation_jobs_lock = threading.Lock()
+        self.histograms = (Histogram('therrc_request_duration_seconds', 'Wall time per request.', SECONDS_BUCKETS),
+                           Histogram('therrc_request_sql_seconds', 'Time spent in SQLite per request.', SECONDS_BUCKETS),
+                           Histogram('therrc_request_queries', 'SQL statements executed per request.', (1, 2, 5, 10, 20, 50, 100, 500, 1000)))
+        self.statement_totals = StatementTotals('therrc_statement_sql_seconds', 'SQL time per statement, summed over the requests it was among the slowest statements of.')
+        self.query_profiler = QueryProfiler(slow_ms=config['SLOW_QUERY_MS']) if config['INSTRUMENTATION'] or config['SLOW_QUERY_MS'] is not None else None
+        self.db_manager.connections.profiler = self.query_profiler
+        self.schema_ready = False
+        self._season_simulator = None
+
+    @property
+    def season_simulator(self):
+        if self._season_simulator is None:
+            from Season_Simulator import SeasonSimulator
+            self._season_simulator = SeasonSimulator(self.tournament_app)
+        return self._season_simulator
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.secret_key = os.environ.get('SECRET_KEY', 'a-super-secret-key-that-you-should-change')
+    app.config.update(DATABASE=DB_NAME, ADMIN_PASSWORD=os.environ.get('ADMIN_PASSWORD', 'password123'),
+                      REPORTS_DIR=os.environ.get('REPORTS_DIR', 'report_cache'),
+                      ARCHIVE_DIR=os.environ.get('ARCHIVE_DIR', 'season_archive'),
+                      ARCHIVE_PDF=os.environ.get('ARCHIVE_PDF') == '1',
+                      WRITE_GROUP_WINDOW_MS=float(os.environ.get('WRITE_GROUP_WINDOW_MS', 0)),
+                      LIVE_STREAM={'1': True, '0': False}.get(os.environ.get('LIVE_STREAM')),
+                      LIVE_STREAM_MAX=int(os.environ.get('LIVE_STREAM_MAX', 16)),
+                      INSTRUMENTATION=os.environ.get('INSTRUMENTATION') == '1',
+                      SLOW_QUERY_MS=float(os.environ['SLOW_QUERY_MS']) if os.environ.get('SLOW_QUERY_MS') else None)
+    app.config.update(config or {})
+    svc = app.extensions['therrc'] = TournamentServices(app.config)
+    app.register_blueprint(bp)
+    svc.tournament_app.on_season_complete = lambda tournament_id: svc.report_executor.submit(run_archive_job, app, tournament_id)
+    if svc.query_profiler: install_request_profiling(app, svc.query_profiler, svc.histograms, svc.statement_totals)
+    return app
+
+# `gunicorn app:app` / `flask --app app run`; the database must have been set up with init-db.
+# Live event streams need workers that can hold a connection open without blocking the rest:
+# `gunicorn -k gthread --threads 32 app:app` (or gevent with LIVE_STREAM=1), where streams take at most
+# LIVE_STREAM_MAX (16) of the threads. Sync workers serve polling only.
+app = create_app()
+
 # --- Main Execution ---
 if __name__ == '__main__':
+    with app.app_context(): db_manager.create_tables()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,179 @@
+# asgi.py (optional asyncio front for match nights: `uvicorn asgi:app`, or any ASGI server)
+#
+# Every request is still answered by the Flask app in app.py, so routes, status codes, headers and ETags
+# are exactly those of `gunicorn app:app`. What changes is the waiting: open connections sit on the event
+# loop instead of each holding a thread, the Flask app runs on three bounded pools (public reads, event
+# streams, and everything else: admin writes, PDFs, pages), and identical public reads that arrive while
+# one is already running share its response instead of queueing another copy. Each open event stream holds
+# a thread of its own pool, so viewers can never take the threads admin writes need; once that pool is
+# full, further streams get a 503 and the page falls back to polling (static/live-updates.js).
+import os
+import io
+import re
+import sys
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+READ_WORKERS = int(os.environ.get('READ_WORKERS', 4))     # threads serving the public read routes
+OTHER_WORKERS = int(os.environ.get('OTHER_WORKERS', 8))   # admin writes, PDFs and the remaining routes
+STREAM_WORKERS = int(os.environ.get('STREAM_WORKERS', 64))  # one per open event stream
+# Streams have their own pool here, so the app's per-process cap (sized for threaded servers) follows it.
+os.environ.setdefault('LIVE_STREAM_MAX', str(STREAM_WORKERS))
+import app as webapp
+STREAM_RETRY_AFTER = 30  # seconds, sent with the 503 for a stream over STREAM_WORKERS
+BODY_SPOOL_MEMORY = 1024 * 1024  # request bodies past this (bulk imports) wait on disk, not in memory
+# GET/HEAD on these are coalesced; the request headers below are the only ones their responses depend on.
+READ_PATHS = re.compile(r"^/(api/tournaments(/\d+)?|(standings|fixtures|reports)(/\d+)?)/?$")
+COALESCE_HEADERS = (b'accept-encoding', b'if-none-match')
+STREAM_PATHS = re.compile(r"^/api/tournaments/\d+/stream/?$")
+
+
+# --- WSGI BRIDGE ---
+# body is the request body as bytes, or a binary file positioned at its end (see AsyncTier.receive_body).
+def wsgi_environ(scope, body):
+    if isinstance(body, bytes): length, body = len(body), io.BytesIO(body)
+    else: length = body.tell(); body.seek(0)
+    server = scope.get('server') or ('localhost', 80)
+    environ = {'REQUEST_METHOD': scope['method'], 'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+               'PATH_INFO': scope['path'].encode().decode('latin-1'), 'QUERY_STRING': scope['query_string'].decode('latin-1'),
+               'SERVER_NAME': server[0], 'SERVER_PORT': str(server[1]), 'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+               'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '', 'CONTENT_LENGTH': str(length),
+               'wsgi.version': (1, 0), 'wsgi.url_scheme': scope.get('scheme', 'http'), 'wsgi.input': body,
+               'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': True, 'wsgi.run_once': False}
+    for name, value in scope['headers']:
+        name, value = name.decode('latin-1').upper().replace('-', '_'), value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'): environ[name] = value
+        else: environ[f'HTTP_{name}'] = f"{environ[f'HTTP_{name}']},{value}" if f'HTTP_{name}' in environ else value
+    return environ
+
+# Runs the WSGI app up to its first body chunk: (status, [(name, value)], body iterator).
+def start_wsgi(wsgi_app, environ):
+    started = []
+    body = wsgi_app(environ, lambda status, headers, exc_info=None: started.append((int(status.split(' ', 1)[0]), headers)))
+    return started[0][0], [(k.encode('latin-1'), v.encode('latin-1')) for k, v in started[0][1]], body
+
+def run_wsgi(wsgi_app, environ):
+    status, headers, body = start_wsgi(wsgi_app, environ)
+    try: return status, headers, b''.join(body)
+    finally:
+        if hasattr(body, 'close'): body.close()
+
+
+# --- ASGI APP ---
+class AsyncTier:
+    def __init__(self, flask_app, read_workers=READ_WORKERS, other_workers=OTHER_WORKERS, stream_workers=STREAM_WORKERS):
+        self.wsgi_app = flask_app.wsgi_app
+        self.read_pool = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='asgi-read')
+        self.other_pool = ThreadPoolExecutor(max_workers=other_workers, thread_name_prefix='asgi-other')
+        self.stream_pool = ThreadPoolExecutor(max_workers=stream_workers, thread_name_prefix='asgi-stream')
+        # Taken on the loop before a stream is queued and given back by its thread when it finishes.
+        self.stream_slots = threading.BoundedSemaphore(stream_workers)
+        self.inflight = {}
+        self.requests = self.coalesced = self.streams_refused = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan': return await self.lifespan(receive, send)
+        if scope['type'] != 'http': return
+        if scope['method'] in ('GET', 'HEAD') and READ_PATHS.match(scope['path']):
+            body = await self.receive_body(receive, io.BytesIO())
+            if body is None: return
+            self.requests += 1
+            status, headers, content = await self.coalesce(scope, body.getvalue())
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': content})
+            return
+        # Everything else hands its body to the pool thread as a file; large uploads spill to disk.
+        body = await self.receive_body(receive, tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_MEMORY))
+        if body is None: return
+        self.requests += 1
+        if STREAM_PATHS.match(scope['path']):
+            if not self.stream_slots.acquire(blocking=False):
+                body.close()
+                self.streams_refused += 1
+                await send({'type': 'http.response.start', 'status': 503,
+                            'headers': [(b'content-type', b'text/plain'), (b'retry-after', str(STREAM_RETRY_AFTER).encode())]})
+                await send({'type': 'http.response.body', 'body': b'Too many open event streams'})
+                return
+            await self.stream(scope, body, receive, send, self.stream_pool, self.stream_slots.release)
+        else:
+            await self.stream(scope, body, receive, send, self.other_pool)
+
+    # Reads the request body into sink (a binary file); None if the client hung up first.
+    async def receive_body(self, receive, sink):
+        more = True
+        while more:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                sink.close()
+                return None
+            sink.write(message.get('body', b''))
+            more = message.get('more_body', False)
+        return sink
+
+    # The first request for a key starts the work; later ones await the same future until it is done.
+    # The future is shielded so a client that hangs up does not cancel it for the others.
+    async def coalesce(self, scope, body):
+        headers = dict(scope['headers'])
+        key = (scope['method'], scope['path'], scope['query_string'], *(headers.get(name) for name in COALESCE_HEADERS))
+        future = self.inflight.get(key)
+        if future is None:
+            future = self.inflight[key] = asyncio.get_running_loop().run_in_executor(self.read_pool, run_wsgi, self.wsgi_app, wsgi_environ(scope, body))
+            future.add_done_callback(lambda f: self.inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    # The whole response runs on one pool thread (a streamed body keeps its request context on the thread
+    # that started it) and hands its chunks to the loop. Once the client disconnects the thread stops at
+    # the next chunk, which for an event stream is at most one heartbeat away; release runs after that.
+    async def stream(self, scope, body, receive, send, pool, release=None):
+        loop, chunks, stop = asyncio.get_running_loop(), asyncio.Queue(), threading.Event()
+        def produce():
+            try:
+                status, headers, iterator = start_wsgi(self.wsgi_app, wsgi_environ(scope, body))
+                loop.call_soon_threadsafe(chunks.put_nowait, (status, headers))
+                try:
+                    for chunk in iterator:
+                        if stop.is_set(): break
+                        if chunk: loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+                finally:
+                    if hasattr(iterator, 'close'): iterator.close()
+            finally:
+                body.close()
+                if release: release()
+                loop.call_soon_threadsafe(chunks.put_nowait, None)
+        loop.run_in_executor(pool, produce)
+        disconnected = asyncio.ensure_future(receive())
+        try:
+            start = await chunks.get()
+            status, headers = start if start is not None else (500, [])
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            while start is not None:
+                chunk = asyncio.ensure_future(chunks.get())
+                await asyncio.wait((chunk, disconnected), return_when=asyncio.FIRST_COMPLETED)
+                if not chunk.done():
+                    chunk.cancel()
+                    return
+                if chunk.result() is None: break
+                await send({'type': 'http.response.body', 'body': chunk.result(), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            stop.set()
+            disconnected.cancel()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.read_pool.shutdown(wait=False)
+                self.other_pool.shutdown(wait=False)
+                self.stream_pool.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+app = AsyncTier(webapp.app)
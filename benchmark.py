@@ -0,0 +1,379 @@
+# benchmark.py (synthetic large-scale benchmarks with JSON results and a compare mode)
+#
+#   python benchmark.py --out bench.json                   # run the suite, write results
+#   python benchmark.py --seasons 300 --teams 300 --legs 2  # bigger synthetic database
+#   python benchmark.py --compare base.json bench.json      # exit 1 on regressions
+#   python benchmark.py --check-imports                     # exit 1 if importing app is slow or heavy
+#   python benchmark.py --load-test --seasons 20 --teams 40  # threaded vs asyncio front; exit 1 if asyncio is not faster
+#                                                           # or open event streams hold up an admin write
+
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import sqlite3
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+import tracemalloc
+
+# Background season shapes: (num_groups, teams_per_group, knockout_mode, num_legs)
+SEASON_SHAPES = [(4, 4, '3', 2), (2, 6, '2', 2), (1, 20, '3', 2), (4, 6, '3', 1), (1, 12, '2', 1), (8, 4, '4', 1), (16, 4, '5', 1)]
+DEFAULT_THRESHOLD = 0.15  # relative slowdown of the median that counts as a regression...
+DEFAULT_MIN_DELTA_MS = 0.5  # ...when it is also at least this many milliseconds (sub-ms noise is ignored)
+DEFAULT_IMPORT_BUDGET_MS = 350  # `import app` + create_app() in a fresh interpreter; Flask alone is most of it
+HEAVY_MODULES = ('numpy', 'reportlab', 'tabulate', 'colorama')  # only loaded by the requests that need them
+CONCURRENT_SCORERS = 8  # admin clients entering results at the same time in 'result_entry_concurrent'
+DEFAULT_LOAD_CLIENTS = '4,16,64'  # concurrent connections tried per tier by --load-test
+DEFAULT_P99_MS = 100  # latency budget a tier's throughput is reported at
+DEFAULT_LOAD_STREAMS = 64  # event streams held open by --load-test while an admin result is entered
+STREAM_WRITE_TIMEOUT = 10  # seconds before that result counts as locked out by the streams
+
+
+# --- SYNTHETIC DATA (created through the same API routes an admin uses) ---
+def season_form(season_number, num_groups, teams_per_group, knockout_mode, num_legs):
+    form = {'num_groups': num_groups, 'num_teams_per_group': teams_per_group, 'knockout_mode': knockout_mode,
+            'num_legs': num_legs, 'season_number': season_number}
+    from Tournament_Manager import group_labels  # imported with the app (see run_suite), not at startup
+    for g in group_labels(num_groups):
+        for j in range(teams_per_group): form[f'team_{g}_{j}'] = f"S{season_number}{g}TEAM{j}"
+    return form
+
+# Returns the new tournament's id (the create route only answers with a message).
+def create_season(client, services, form):
+    response = client.post('/api/admin/create', json=form)
+    if not response.json['success']: raise RuntimeError(response.json['message'])
+    return max(row['tournament_id'] for row in services.db_manager.get_all_tournaments())
+
+def populate(client, services, seasons, seed):
+    for i in range(seasons):
+        tournament_id = create_season(client, services, season_form(i + 1, *SEASON_SHAPES[i % len(SEASON_SHAPES)]))
+        client.post(f"/api/admin/autogenerate/{tournament_id}", json={'seed': seed + i})
+
+
+# --- MEASUREMENT ---
+# Each op(i) gets its own target, so stateful operations are never repeated on the same data.
+# The timed runs are clean; one extra run is made with tracemalloc and the SQL trace switched on.
+# 'queries' counts statement executions as SQLite sees them, so each executemany row counts once.
+def measure(services, op, runs):
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        op(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    queries = []
+    connections = services.db_manager.connections
+    connections.close()
+    connections.trace = lambda sql: queries.append(sql) if sql.lstrip()[:6].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE') else None
+    tracemalloc.start()
+    try:
+        op(runs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        connections.close()
+        connections.trace = None
+    return {'runs': runs, 'min_ms': round(min(timings), 3), 'median_ms': round(statistics.median(timings), 3),
+            'mean_ms': round(statistics.fmean(timings), 3), 'max_ms': round(max(timings), 3),
+            'queries': len(queries), 'peak_kb': round(peak / 1024, 1)}
+
+# Cold import of the app in fresh interpreters (best of `runs`), and which heavy modules it pulled in.
+def measure_import(runs):
+    probe = ("import sys, time\nstart = time.perf_counter()\nimport app\napp.create_app()\n"
+             "print((time.perf_counter() - start) * 1000)\n"
+             f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    timings, loaded = [], set()
+    with tempfile.TemporaryDirectory(prefix='therrc-import-') as workdir:
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, cwd=workdir, env=env, check=True).stdout.splitlines()
+            timings.append(float(out[0]))
+            loaded.update(m for m in out[1].split(',') if m)
+    return {'runs': runs, 'min_ms': round(min(timings), 1), 'median_ms': round(statistics.median(timings), 1), 'heavy_modules': sorted(loaded)}
+
+def check_imports(runs, budget_ms):
+    result = measure_import(runs)
+    print(f"import app: {result['min_ms']:.1f} ms best of {runs} (budget {budget_ms:.0f} ms), heavy modules loaded: {', '.join(result['heavy_modules']) or 'none'}")
+    return 1 if result['min_ms'] > budget_ms or result['heavy_modules'] else 0
+
+def run_suite(args):
+    out_path = os.path.abspath(args.out)
+    workdir = tempfile.mkdtemp(prefix='therrc-bench-')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    random.seed(args.seed)
+    try:
+        import app as webapp
+        flask_app = webapp.create_app({'DATABASE': os.path.join(workdir, 'bench.db'), 'REPORTS_DIR': os.path.join(workdir, 'reports')})
+        services = flask_app.extensions['therrc']
+        services.db_manager.create_tables()
+        client = flask_app.test_client()
+        with client.session_transaction() as session: session['logged_in'] = True
+
+        start = time.perf_counter()
+        populate(client, services, args.seasons, args.seed)
+        setup_s = time.perf_counter() - start
+        runs = args.repeat
+        targets = []
+        results = {}
+
+        def create(i): targets.append(create_season(client, services, season_form(10000 + len(targets), 1, args.teams, '3', args.legs)))
+        results['create_league'] = measure(services, create, runs)
+
+        pending = {tid: services.db_manager.get_pending_initial_fixtures(tid)[0]['match_no'] for tid in targets}
+        def enter_group_result(i): client.post('/api/admin/update_result', json={'match_no': pending[targets[i]], 'team1_goals': 2, 'team2_goals': 1})
+        results['result_entry_group'] = measure(services, enter_group_result, runs)
+
+        # One result from each of CONCURRENT_SCORERS threads at once; the writer thread commits them in groups.
+        scorers = [flask_app.test_client() for _ in range(CONCURRENT_SCORERS)]
+        for scorer in scorers:
+            with scorer.session_transaction() as session: session['logged_in'] = True
+        def enter_concurrent_results(i):
+            matches = [f['match_no'] for f in services.db_manager.get_pending_initial_fixtures(targets[i])[:CONCURRENT_SCORERS]]
+            threads = [threading.Thread(target=scorer.post, args=('/api/admin/update_result',), kwargs={'json': {'match_no': match_no, 'team1_goals': 1, 'team2_goals': 1}})
+                       for scorer, match_no in zip(scorers, matches)]
+            for thread in threads: thread.start()
+            for thread in threads: thread.join()
+        results['result_entry_concurrent'] = measure(services, enter_concurrent_results, runs)
+
+        # Fixture generation alone (no database): one league of --teams, and 16 groups sharing them.
+        def schedule(num_groups):
+            settings = {'is_league_mode': num_groups == 1, 'num_legs': args.legs}
+            teams_by_group = {g: list(range(args.teams // num_groups)) for g in webapp.group_labels(num_groups)}
+            for _ in services.tournament_app.generate_group_stage_fixtures(0, settings, teams_by_group): pass
+        results['schedule_league'] = measure(services, lambda i: schedule(1), runs)
+        results['schedule_16_groups'] = measure(services, lambda i: schedule(16), runs)
+
+        def autogenerate(i): client.post(f"/api/admin/autogenerate/{targets[i]}", json={'seed': args.seed + i})
+        results['autogenerate'] = measure(services, autogenerate, runs)
+
+        first_knockout = {tid: next(f.match_no for f in services.db_manager.get_all_fixtures(tid) if not f.is_initial_stage) for tid in targets}
+        def enter_knockout_result(i): client.post('/api/admin/update_result', json={'match_no': first_knockout[targets[i]], 'team1_goals': 1, 'team2_goals': 0})
+        results['result_entry_knockout'] = measure(services, enter_knockout_result, runs)
+
+        tid = targets[0]
+        results['get_all_fixtures'] = measure(services, lambda i: services.db_manager.get_all_fixtures(tid), runs)
+
+        def api_cold(i):
+            services.payload_cache.discard(tid)
+            client.get(f'/api/tournaments/{tid}')
+        results['api_tournament_cold'] = measure(services, api_cold, runs)
+        results['api_tournament_warm'] = measure(services, lambda i: client.get(f'/api/tournaments/{tid}'), runs)
+        etag = client.get(f'/api/tournaments/{tid}').headers['ETag']
+        results['api_tournament_304'] = measure(services, lambda i: client.get(f'/api/tournaments/{tid}', headers={'If-None-Match': etag}), runs)
+        since = services.db_manager.get_tournament_version(tid) - 1
+        results['api_tournament_delta'] = measure(services, lambda i: client.get(f'/api/tournaments/{tid}?since={since}'), runs)
+
+        with services.db_manager.connections.reader() as cur:
+            cur.execute("SELECT (SELECT COUNT(*) FROM tournaments) AS tournaments, (SELECT COUNT(*) FROM teams) AS teams, (SELECT COUNT(*) FROM fixtures) AS fixtures")
+            sizes = dict(cur.fetchone())
+        services.db_manager.connections.close()
+        import_time = measure_import(args.repeat)
+    finally:
+        if args.keep_db: print(f"Database kept in {workdir}")
+        else: shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'meta': dict(run_metadata(args, setup_s, sizes), import_app=import_time), 'results': results}
+    with open(out_path, 'w') as f: json.dump(report, f, indent=2)
+    print_results(report)
+    print(f"\nResults written to {out_path}")
+
+# --- LOAD TEST ---
+# Match-night traffic on one league while a scorer enters a result every --write-interval-ms, so the
+# payload goes cold again after every write: fresh page loads of the full payload, ?since= polls and the
+# season list. The same app is driven once the way a threaded WSGI server runs it (one thread per open
+# connection) and once through the asyncio front in asgi.py; both get identical requests. Each tier's
+# score is its best throughput, over the --clients levels, whose p99 stays within --p99-ms. Finally
+# --streams viewers hold the event stream open on the asyncio front while an admin enters a result
+# through it; that write has to finish within --p99-ms however many streams are open.
+def load_scope(i, tournament_id, since):
+    kind = i % 10
+    path, query = ('/api/tournaments', b'') if kind == 9 else (f'/api/tournaments/{tournament_id}', f'since={since}'.encode() if kind >= 6 else b'')
+    return {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query, 'headers': [(b'accept-encoding', b'gzip, br')],
+            'http_version': '1.1', 'scheme': 'http', 'server': ('localhost', 80), 'client': ('127.0.0.1', 0)}
+
+def drive_threads(asgi, flask_app, clients, duration, make_scope):
+    latencies, stop = [], time.perf_counter() + duration
+    def client(n):
+        i = n
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            asgi.run_wsgi(flask_app.wsgi_app, asgi.wsgi_environ(make_scope(i), b''))
+            latencies.append(time.perf_counter() - start)
+            i += clients
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    return latencies
+
+def drive_async(tier, clients, duration, make_scope):
+    latencies, stop = [], time.perf_counter() + duration
+    async def receive(): return {'type': 'http.request', 'body': b'', 'more_body': False}
+    async def send(message): pass
+    async def client(n):
+        i = n
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            await tier(make_scope(i), receive, send)
+            latencies.append(time.perf_counter() - start)
+            i += clients
+    async def run_clients(): await asyncio.gather(*(client(n) for n in range(clients)))
+    asyncio.run(run_clients())
+    return latencies
+
+def stream_write_latency(tier, streams, tournament_id, match_no, cookie):
+    async def run():
+        opened, hang_up, started = asyncio.Event(), asyncio.Event(), []
+        def scope(method, path, headers=()):
+            return {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'headers': list(headers),
+                    'http_version': '1.1', 'scheme': 'http', 'server': ('localhost', 80), 'client': ('127.0.0.1', 0)}
+        async def viewer():
+            requested = []
+            async def receive():
+                if not requested:
+                    requested.append(True)
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await hang_up.wait()
+                return {'type': 'http.disconnect'}
+            async def send(message):
+                if message['type'] != 'http.response.start': return
+                started.append(message['status'])
+                if len(started) == streams: opened.set()
+            await tier(scope('GET', f'/api/tournaments/{tournament_id}/stream'), receive, send)
+        viewers = [asyncio.ensure_future(viewer()) for _ in range(streams)]
+        try: await asyncio.wait_for(opened.wait(), STREAM_WRITE_TIMEOUT)
+        except asyncio.TimeoutError: pass  # some streams are still queued for a thread; write anyway
+        body, result = json.dumps({'match_no': match_no, 'team1_goals': 1, 'team2_goals': 0}).encode(), []
+        async def receive(): return {'type': 'http.request', 'body': body, 'more_body': False}
+        async def send(message):
+            if message['type'] == 'http.response.start': result.append(message['status'])
+        headers = [(b'content-type', b'application/json'), (b'cookie', f'session={cookie}'.encode())]
+        open_streams, start = started.count(200), time.perf_counter()
+        try: await asyncio.wait_for(tier(scope('POST', '/api/admin/update_result', headers), receive, send), STREAM_WRITE_TIMEOUT)
+        except asyncio.TimeoutError: result.append(None)
+        elapsed = time.perf_counter() - start
+        hang_up.set()
+        await asyncio.gather(*viewers)
+        return elapsed, result[0], open_streams
+    return asyncio.run(run())
+
+def run_load_test(args):
+    workdir = tempfile.mkdtemp(prefix='therrc-load-')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    try:
+        import app as webapp
+        import asgi
+        flask_app = webapp.create_app({'DATABASE': os.path.join(workdir, 'load.db'), 'REPORTS_DIR': os.path.join(workdir, 'reports')})
+        services = flask_app.extensions['therrc']
+        services.db_manager.create_tables()
+        client = flask_app.test_client()
+        with client.session_transaction() as session: session['logged_in'] = True
+        populate(client, services, args.seasons, args.seed)
+        tid = create_season(client, services, season_form(10000, 1, args.teams, '3', args.legs))
+        pending = iter([f['match_no'] for f in services.db_manager.get_pending_initial_fixtures(tid)])
+        tier = asgi.AsyncTier(flask_app)
+        rows = []
+        for name in ('threaded', 'asyncio'):
+            for clients in [int(n) for n in args.clients.split(',')]:
+                since = services.db_manager.get_tournament_version(tid)
+                stop = threading.Event()
+                def score():
+                    while not stop.wait(args.write_interval_ms / 1000):
+                        client.post('/api/admin/update_result', json={'match_no': next(pending), 'team1_goals': random.randint(0, 3), 'team2_goals': random.randint(0, 3)})
+                scorer = threading.Thread(target=score)
+                scorer.start()
+                make_scope = lambda i: load_scope(i, tid, since)
+                try:
+                    if name == 'threaded': latencies = drive_threads(asgi, flask_app, clients, args.duration, make_scope)
+                    else: latencies = drive_async(tier, clients, args.duration, make_scope)
+                finally:
+                    stop.set()
+                    scorer.join()
+                latencies.sort()
+                rows.append({'tier': name, 'clients': clients, 'requests': len(latencies), 'rps': round(len(latencies) / args.duration, 1),
+                             'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2), 'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 2)})
+                print(f"{name:9} {clients:>4} clients {rows[-1]['rps']:>9.1f} req/s  p50 {rows[-1]['p50_ms']:>8.2f} ms  p99 {rows[-1]['p99_ms']:>8.2f} ms")
+        print(f"asyncio front: {tier.coalesced} of {tier.requests} requests served by a coalesced response")
+        seconds, status, open_streams = stream_write_latency(tier, args.streams, tid, next(pending), client.get_cookie('session').value)
+        # The disconnected streams stop at their next event; send one rather than wait for the heartbeat.
+        services.broadcaster.publish(tid, 'refresh', {'version': services.db_manager.get_tournament_version(tid)})
+        write_ok = status == 200 and seconds * 1000 <= args.p99_ms
+        print(f"{open_streams} open event streams ({tier.streams_refused} refused): admin result "
+              f"{'timed out' if status is None else f'{status} in {seconds * 1000:.2f} ms'}")
+    finally:
+        if args.keep_db: print(f"Database kept in {workdir}")
+        else: shutil.rmtree(workdir, ignore_errors=True)
+    best = {name: max((r['rps'] for r in rows if r['tier'] == name and r['p99_ms'] <= args.p99_ms), default=0.0) for name in ('threaded', 'asyncio')}
+    print(f"\nbest req/s with p99 <= {args.p99_ms:g} ms: threaded {best['threaded']:.1f}, asyncio {best['asyncio']:.1f}")
+    return 0 if best['asyncio'] > best['threaded'] and write_ok else 1
+
+def run_metadata(args, setup_s, sizes):
+    try: commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError: commit = None
+    return {'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'), 'commit': commit, 'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version, 'platform': platform.platform(),
+            'params': {'seasons': args.seasons, 'teams': args.teams, 'legs': args.legs, 'repeat': args.repeat, 'seed': args.seed},
+            'database': sizes, 'setup_s': round(setup_s, 2)}
+
+
+# --- REPORTING ---
+def print_results(report):
+    meta = report['meta']
+    print(f"commit {meta['commit']}  python {meta['python']}  sqlite {meta['sqlite']}  db {meta['database']}")
+    if meta.get('import_app'): print(f"import app {meta['import_app']['min_ms']:.1f} ms (best), heavy modules: {', '.join(meta['import_app']['heavy_modules']) or 'none'}")
+    print(f"{'operation':24} {'median ms':>10} {'min ms':>10} {'max ms':>10} {'queries':>8} {'peak KB':>10}")
+    for name, r in report['results'].items():
+        print(f"{name:24} {r['median_ms']:>10.2f} {r['min_ms']:>10.2f} {r['max_ms']:>10.2f} {r['queries']:>8} {r['peak_kb']:>10.1f}")
+
+# A regression is a median slowdown beyond both thresholds or any increase in query count.
+def compare(base_path, new_path, threshold, min_delta_ms):
+    with open(base_path) as f: base = json.load(f)
+    with open(new_path) as f: new = json.load(f)
+    if base['meta']['params'] != new['meta']['params']: print(f"Warning: runs used different parameters: {base['meta']['params']} vs {new['meta']['params']}")
+    print(f"{'operation':24} {'base ms':>10} {'new ms':>10} {'change':>8} {'queries':>12}")
+    regressions = []
+    for name in dict.fromkeys([*base['results'], *new['results']]):
+        b, n = base['results'].get(name), new['results'].get(name)
+        if not b or not n:
+            print(f"{name:24} {'only in ' + ('base' if b else 'new'):>32}")
+            continue
+        change = (n['median_ms'] - b['median_ms']) / b['median_ms'] if b['median_ms'] else 0.0
+        flag = (change > threshold and n['median_ms'] - b['median_ms'] >= min_delta_ms) or n['queries'] > b['queries']
+        if flag: regressions.append(name)
+        print(f"{name:24} {b['median_ms']:>10.2f} {n['median_ms']:>10.2f} {change:>+8.1%} {str(b['queries']) + ' -> ' + str(n['queries']):>12}{'  REGRESSION' if flag else ''}")
+    print(f"\n{len(regressions)} regression(s)" + (f": {', '.join(regressions)}" if regressions else ""))
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tournament manager on a synthetic database.")
+    parser.add_argument('--out', default='bench.json', help="where to write the JSON results")
+    parser.add_argument('--seasons', type=int, default=200, help="background seasons created before measuring")
+    parser.add_argument('--teams', type=int, default=200, help="teams in each measured league season")
+    parser.add_argument('--legs', type=int, default=2, help="legs of each measured league season")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per operation")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep-db', action='store_true', help="keep the synthetic database for inspection")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help="compare two result files instead of running")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="relative median slowdown flagged by --compare")
+    parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS, help="smallest absolute slowdown flagged by --compare")
+    parser.add_argument('--check-imports', action='store_true', help="only check the app's import time and heavy modules")
+    parser.add_argument('--import-budget-ms', type=float, default=DEFAULT_IMPORT_BUDGET_MS, help="import time allowed by --check-imports")
+    parser.add_argument('--load-test', action='store_true', help="only compare the threaded and asyncio fronts under concurrent reads")
+    parser.add_argument('--clients', default=DEFAULT_LOAD_CLIENTS, help="comma-separated concurrent clients tried by --load-test")
+    parser.add_argument('--duration', type=float, default=3.0, help="seconds per --load-test level")
+    parser.add_argument('--write-interval-ms', type=float, default=250, help="time between results entered during --load-test")
+    parser.add_argument('--streams', type=int, default=DEFAULT_LOAD_STREAMS, help="event streams held open by --load-test during an admin write")
+    parser.add_argument('--p99-ms', type=float, default=DEFAULT_P99_MS, help="p99 budget --load-test compares throughput at")
+    args = parser.parse_args()
+    if args.compare: sys.exit(compare(*args.compare, args.threshold, args.min_delta_ms))
+    if args.check_imports: sys.exit(check_imports(args.repeat, args.import_budget_ms))
+    if args.load_test: sys.exit(run_load_test(args))
+    run_suite(args)
+
+if __name__ == '__main__':
+    main()
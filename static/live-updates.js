@@ -0,0 +1,92 @@
+// Keeps a tournament payload (the /api/tournaments/<id> JSON) up to date from the server's event stream,
+// or by polling /api/tournaments/<id>?since=<version> where EventSource is unavailable or the server
+// does not serve live streams.
+
+const POLL_INTERVAL_MS = 15000;
+
+// Fixture rows (from a live event or a delta) are merged into the payload by match_no.
+function applyFixtureRows(data, rows) {
+    const byMatch = new Map((data.fixtures || []).map(match => [match.match_no, match]));
+    rows.forEach(row => {
+        const match = byMatch.get(row.match_no);
+        if (match) Object.assign(match, row);
+    });
+}
+
+// Changed rows are merged by team name, then each group is re-ordered as the server ranked it.
+function applyStandingsGroups(data, groups) {
+    for (const groupName in groups) {
+        const rows = new Map((data.standings[groupName] || []).map(team => [team.name, team]));
+        groups[groupName].rows.forEach(row => rows.set(row.name, Object.assign(rows.get(row.name) || {}, row)));
+        data.standings[groupName] = groups[groupName].order.map(name => rows.get(name)).filter(Boolean);
+    }
+}
+
+function reloadTournament(tournamentId, data, onUpdate) {
+    return fetch(`/api/tournaments/${tournamentId}`)
+        .then(response => response.json())
+        .then(fresh => {
+            Object.assign(data, fresh);
+            onUpdate('refresh');
+        });
+}
+
+// `data` is patched in place and onUpdate(type) is called after every change, where type is one of
+// 'fixtures', 'standings', 'bracket' or 'refresh' (the whole payload was re-fetched).
+// Returns an object with close(), to be called when the page switches tournaments.
+function watchTournament(tournamentId, data, onUpdate) {
+    if (!window.EventSource) return pollTournament(tournamentId, data, onUpdate);
+    const source = new EventSource(`/api/tournaments/${tournamentId}/stream?version=${data.version}`);
+
+    source.addEventListener('fixtures', event => {
+        const message = JSON.parse(event.data);
+        applyFixtureRows(data, message.fixtures);
+        data.version = message.version;
+        onUpdate('fixtures');
+    });
+
+    source.addEventListener('standings', event => {
+        const message = JSON.parse(event.data);
+        applyStandingsGroups(data, message.groups);
+        data.version = message.version;
+        onUpdate('standings');
+    });
+
+    source.addEventListener('bracket', event => {
+        const message = JSON.parse(event.data);
+        applyFixtureRows(data, message.slots.filter(slot => slot.team_name).map(slot => ({match_no: slot.match_no, [`team${slot.side}_name`]: slot.team_name})));
+        data.version = message.version;
+        onUpdate('bracket');
+    });
+
+    // Bulk changes (or events this connection missed) reload the payload once.
+    source.addEventListener('refresh', () => reloadTournament(tournamentId, data, onUpdate));
+
+    // A server without live streams answers 204, which closes the EventSource for good: poll instead.
+    let poller = null;
+    source.addEventListener('error', () => {
+        if (source.readyState === EventSource.CLOSED && !poller) poller = pollTournament(tournamentId, data, onUpdate);
+    });
+    return { close: () => { source.close(); if (poller) poller.close(); } };
+}
+
+// Fallback: ask only for the rows changed since the version already rendered.
+function pollTournament(tournamentId, data, onUpdate) {
+    const timer = setInterval(() => {
+        fetch(`/api/tournaments/${tournamentId}?since=${data.version}`)
+            .then(response => response.json())
+            .then(delta => {
+                if (delta.since === undefined) {
+                    Object.assign(data, delta);
+                    onUpdate('refresh');
+                    return;
+                }
+                if (delta.version === data.version) return;
+                applyFixtureRows(data, delta.fixtures);
+                applyStandingsGroups(data, delta.standings);
+                data.version = delta.version;
+                onUpdate('refresh');
+            });
+    }, POLL_INTERVAL_MS);
+    return { close: () => clearInterval(timer) };
+}
@@ -0,0 +1,73 @@
+# The modules under test live at the repository root.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# A fresh app on a temp database, with a logged-in admin client.
+@pytest.fixture
+def app(tmp_path):
+    import app as webapp
+    flask_app = webapp.create_app({'DATABASE': str(tmp_path / 'test.db'), 'REPORTS_DIR': str(tmp_path / 'reports'),
+                                   'ARCHIVE_DIR': str(tmp_path / 'archive'), 'TESTING': True})
+    services = flask_app.extensions['therrc']
+    services.db_manager.create_tables()
+    yield flask_app
+    services.db_manager.connections.close()
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session: session['logged_in'] = True
+    return client
+
+
+# One season created through the admin API; teams are named by group and index (A0, A1, ..., B0, ...).
+class Season:
+    def __init__(self, app, client, num_groups, teams_per_group, knockout_mode='0', num_legs=1):
+        from Tournament_Manager import group_labels
+        self.app, self.client = app, client
+        self.db = app.extensions['therrc'].db_manager
+        form = {'num_groups': num_groups, 'num_teams_per_group': teams_per_group, 'knockout_mode': knockout_mode,
+                'num_legs': num_legs, 'season_number': len(self.db.get_all_tournaments()) + 1}
+        for group in group_labels(num_groups):
+            for j in range(teams_per_group): form[f'team_{group}_{j}'] = f'{group}{j}'
+        response = client.post('/api/admin/create', json=form)
+        assert response.json['success'], response.json['message']
+        self.tournament_id = max(row['tournament_id'] for row in self.db.get_all_tournaments())
+
+    @property
+    def version(self):
+        return self.db.get_tournament_version(self.tournament_id)
+
+    def fixtures(self):
+        return self.db.get_all_fixtures(self.tournament_id)
+
+    def fixture(self, home, away):
+        for match in self.fixtures():
+            if match.team1 and match.team2 and {match.team1.name, match.team2.name} == {home, away}: return match
+        raise LookupError(f"no fixture {home} v {away}")
+
+    # Enters home-away goals for the fixture between the two teams, whichever way round it is stored.
+    def play(self, home, away, home_goals, away_goals, pso=(None, None)):
+        match = self.fixture(home, away)
+        flipped = match.team1.name != home
+        goals, pso = ((away_goals, home_goals), pso[::-1]) if flipped else ((home_goals, away_goals), pso)
+        response = self.client.post('/api/admin/update_result', json={'match_no': match.match_no, 'team1_goals': goals[0], 'team2_goals': goals[1],
+                                                                      'pso_t1': pso[0], 'pso_t2': pso[1]})
+        assert response.json['success'], response.json['message']
+        return match.match_no
+
+    def table(self, group):
+        return [row['name'] for row in self.db.standings.tables(self.tournament_id)[group]]
+
+    def counters(self):
+        return {team.name: (team.matches_played, team.wins, team.draws, team.losses, team.goals_for, team.goals_against)
+                for team in self.db.get_all_teams(self.tournament_id)}
+
+@pytest.fixture
+def make_season(app, client):
+    return lambda *args, **kwargs: Season(app, client, *args, **kwargs)
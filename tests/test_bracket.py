@@ -0,0 +1,56 @@
+# Knockout promotion through the persisted bracket graph (bracket_slots): group ranks seed the first
+# round once the group stage is complete, winners move on, and the seeding is frozen once played.
+
+def knockout(season):
+    return [m for m in season.fixtures() if not m.is_initial_stage]
+
+def names(match):
+    return (match.team1.name if match.team1 else None, match.team2.name if match.team2 else None)
+
+# Plays every group fixture; the team with the lower index wins, so each group finishes X0, X1, X2, ...
+def play_group_stage(season):
+    for match in season.fixtures():
+        if match.is_initial_stage and match.status != 'Played':
+            home, away = match.team1.name, match.team2.name
+            season.play(home, away, *((1, 0) if home < away else (0, 1)))
+
+def test_group_ranks_seed_the_first_round_when_the_stage_completes(make_season):
+    season = make_season(2, 4, knockout_mode='2')
+    assert season.db.is_bracket_built(season.tournament_id)
+    semis = knockout(season)[:2]
+    assert all(names(m) == (None, None) for m in semis)
+    play_group_stage(season)
+    fixtures = {m.match_no: m for m in knockout(season)}
+    rank_slots = [s for s in season.db.get_bracket_slots(season.tournament_id) if s['source_rank'] is not None]
+    assert len(rank_slots) == 4
+    for slot in rank_slots:
+        assert names(fixtures[slot['match_no']])[slot['side'] - 1] == season.table(slot['source_group'])[slot['source_rank'] - 1]
+
+def test_winners_fill_the_next_round(make_season):
+    season = make_season(2, 4, knockout_mode='2')
+    play_group_stage(season)
+    first, second, final = knockout(season)
+    assert names(final) == (None, None)
+    season.play(*names(first), 1, 1, pso=(3, 4))  # decided on penalties
+    season.play(*names(second), 2, 0)
+    assert names(knockout(season)[2]) == (names(first)[1], names(second)[0])
+
+def test_a_group_correction_after_the_knockouts_started_leaves_the_bracket_alone(make_season):
+    season = make_season(2, 4, knockout_mode='2')
+    play_group_stage(season)
+    first = knockout(season)[0]
+    season.play(*names(first), 2, 0)
+    bracket = [names(m) for m in knockout(season)]
+    season.play('A0', 'A1', 0, 5)  # A1 now tops group A
+    assert season.table('A')[0] == 'A1'
+    assert [names(m) for m in knockout(season)] == bracket
+    seeded = [name for m in knockout(season)[:2] for name in names(m)]
+    assert len(seeded) == len(set(seeded))
+
+def test_league_places_seed_the_final(make_season):
+    season = make_season(1, 4, knockout_mode='1')
+    play_group_stage(season)
+    slots = season.db.get_bracket_slots(season.tournament_id)
+    assert [(s['placeholder'], s['source_rank']) for s in slots] == [('1st Place', 1), ('2nd Place', 2)]
+    (final,) = knockout(season)
+    assert names(final) == ('A0', 'A1')
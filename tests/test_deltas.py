@@ -0,0 +1,60 @@
+# ?since= deltas and the incrementally maintained team counters, through result entry, correction and import.
+
+
+def test_since_returns_only_what_changed(make_season):
+    season = make_season(1, 4)
+    since = season.version
+    match_no = season.play('A0', 'A1', 2, 1)
+    delta = season.client.get(f'/api/tournaments/{season.tournament_id}?since={since}').json
+    assert delta['since'] == since and delta['version'] == season.version
+    assert [f['match_no'] for f in delta['fixtures']] == [match_no]
+    assert sorted(row['name'] for row in delta['standings']['A']['rows']) == ['A0', 'A1']
+    assert delta['standings']['A']['order'] == season.table('A')
+
+def test_since_at_current_version_is_empty_and_revalidates(make_season):
+    season = make_season(1, 4)
+    season.play('A0', 'A1', 2, 1)
+    url = f'/api/tournaments/{season.tournament_id}?since={season.version}'
+    response = season.client.get(url)
+    assert response.json['fixtures'] == [] and response.json['standings'] == {}
+    assert season.client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+def test_since_from_the_future_gets_the_full_payload(make_season):
+    season = make_season(1, 4)
+    payload = season.client.get(f'/api/tournaments/{season.tournament_id}?since={season.version + 5}').json
+    assert 'since' not in payload and len(payload['fixtures']) == 6
+
+def test_correction_replaces_the_old_result_in_the_counters(make_season):
+    season = make_season(1, 3)
+    season.play('A0', 'A1', 2, 0)
+    since = season.version
+    match_no = season.play('A0', 'A1', 1, 3)
+    counters = season.counters()
+    assert counters['A0'] == (1, 0, 0, 1, 1, 3)
+    assert counters['A1'] == (1, 1, 0, 0, 3, 1)
+    assert counters['A2'] == (0, 0, 0, 0, 0, 0)
+    assert season.db.rebuild_standings(season.tournament_id) == []
+    delta = season.client.get(f'/api/tournaments/{season.tournament_id}?since={since}').json
+    assert [f['match_no'] for f in delta['fixtures']] == [match_no]
+
+def test_import_applies_new_results_and_corrections_in_one_version(make_season):
+    season = make_season(1, 3)
+    season.play('A0', 'A1', 2, 0)
+    since = season.version
+    corrected, new = season.fixture('A0', 'A1'), season.fixture('A1', 'A2')
+    # A correction names its match_no; a new result can leave it out. The unknown team is rejected alone.
+    body = ("match_no,team1,team2,team1_goals,team2_goals\n"
+            f"{corrected.match_no},{corrected.team1.name},{corrected.team2.name},0,0\n"
+            f",{new.team1.name},{new.team2.name},{1 if new.team1.name == 'A1' else 2},{2 if new.team1.name == 'A1' else 1}\n"
+            ",A0,NOPE,1,0\n")
+    response = season.client.post(f'/api/admin/import_results/{season.tournament_id}?format=csv', data=body, content_type='text/csv')
+    assert response.json['success'] and response.json['applied'] == 2
+    assert [error['line'] for error in response.json['errors']] == [4]
+    assert season.version == since + 1
+    counters = season.counters()
+    assert counters['A0'] == (1, 0, 1, 0, 0, 0)
+    assert counters['A1'] == (2, 0, 1, 1, 1, 2)
+    assert counters['A2'] == (1, 1, 0, 0, 2, 1)
+    assert season.db.rebuild_standings(season.tournament_id) == []
+    delta = season.client.get(f'/api/tournaments/{season.tournament_id}?since={since}').json
+    assert len(delta['fixtures']) == 2 and {row['name'] for row in delta['standings']['A']['rows']} == {'A0', 'A1', 'A2'}
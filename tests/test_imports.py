@@ -0,0 +1,9 @@
+# `import app` + create_app() in a fresh interpreter must not pull in the heavy modules that only some
+# requests need (the module half of `benchmark.py --check-imports`; its timing budget is left to the
+# benchmark, where a slow machine cannot fail the suite).
+from benchmark import HEAVY_MODULES, measure_import
+
+
+def test_import_app_loads_no_heavy_modules():
+    assert 'numpy' in HEAVY_MODULES and 'reportlab' in HEAVY_MODULES
+    assert measure_import(runs=1)['heavy_modules'] == []
@@ -0,0 +1,10 @@
+# Every statement the hot paths run is planned against a fresh schema; a full table scan outside
+# FULL_SCAN_ALLOWED is a regression (the same check as `flask --app app check-query-plans`).
+from Tournament_Manager import check_query_plans
+
+
+def test_no_full_table_scans():
+    results = check_query_plans()
+    assert results, "no statements were traced"
+    scans = {shape: found for shape, details, found in results if found}
+    assert not scans, "\n".join(f"{shape}\n    {', '.join(found)}" for shape, found in scans.items())
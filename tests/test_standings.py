@@ -0,0 +1,43 @@
+# StandingsEngine ranking: points, then head-to-head among the teams level on points, then overall figures.
+
+
+def test_head_to_head_beats_goal_difference(make_season):
+    season = make_season(1, 4)
+    season.play('A0', 'A1', 1, 0)  # A0 and A1 finish level on 6 points; A0 won their meeting
+    season.play('A0', 'A2', 1, 0)
+    season.play('A3', 'A0', 1, 0)
+    season.play('A1', 'A2', 5, 0)
+    season.play('A1', 'A3', 5, 0)
+    season.play('A2', 'A3', 0, 0)
+    assert season.table('A') == ['A0', 'A1', 'A3', 'A2']
+
+def test_level_head_to_head_falls_back_to_goal_difference(make_season):
+    season = make_season(1, 4)
+    season.play('A0', 'A1', 1, 1)
+    season.play('A0', 'A2', 1, 0)
+    season.play('A1', 'A2', 4, 0)
+    season.play('A3', 'A0', 0, 0)
+    season.play('A3', 'A1', 0, 0)
+    season.play('A2', 'A3', 0, 0)
+    # A0 and A1 both have 5 points and drew each other; A1's goal difference is better.
+    assert season.table('A')[:2] == ['A1', 'A0']
+
+def test_three_way_tie_is_split_by_the_mini_table_then_reapplied(make_season):
+    season = make_season(1, 4)
+    # A0, A1 and A2 beat each other in a circle and A3, so all three have 6 points. Among themselves A0
+    # is last; A1 and A2 are level (3 points, +1, 4 scored), and their own meeting puts A1 first even
+    # though A2 has the better overall goal difference.
+    season.play('A0', 'A1', 3, 1)
+    season.play('A1', 'A2', 3, 0)
+    season.play('A2', 'A0', 4, 0)
+    season.play('A0', 'A3', 1, 0)
+    season.play('A1', 'A3', 1, 0)
+    season.play('A2', 'A3', 5, 0)
+    assert season.table('A') == ['A1', 'A2', 'A0', 'A3']
+
+def test_tables_follow_corrections(make_season):
+    season = make_season(1, 3)
+    season.play('A0', 'A1', 2, 0)
+    assert season.table('A')[0] == 'A0'
+    season.play('A0', 'A1', 0, 2)
+    assert season.table('A')[0] == 'A1'